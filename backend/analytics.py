@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+GRANULARITIES = ("day", "week", "month")
+METRICS = ("enrollments", "revenue_inr", "revenue_usd", "completions", "certificates")
+
+
+def period_start(granularity: str, at: datetime) -> datetime:
+    """Start of the UTC day, ISO week (Monday) or month containing `at`"""
+    day = datetime(at.year, at.month, at.day)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def bucket_updates(course_id: str, at: datetime, deltas: Dict[str, float]) -> List[UpdateOne]:
+    """Upserts adding `deltas` to the day, week and month buckets of a course"""
+    updates = []
+    for granularity in GRANULARITIES:
+        start = period_start(granularity, at)
+        updates.append(UpdateOne(
+            {"_id": f"{granularity}:{start:%Y-%m-%d}:{course_id}"},
+            {
+                "$inc": deltas,
+                "$setOnInsert": {"granularity": granularity, "period_start": start, "course_id": course_id}
+            },
+            upsert=True
+        ))
+    return updates
+
+
+class Analytics:
+    """Pre-aggregated per-course time buckets in `analytics_buckets`.
+
+    Write paths call `record` as events happen, so range queries read at most
+    one document per course per period instead of scanning raw enrollments
+    and payments. Categories are resolved from the courses at query time.
+    """
+
+    def __init__(self, db):
+        self._db = db
+
+    async def record(self, course_id: str, at: Optional[datetime] = None, session=None, **deltas: float):
+        await self._db.analytics_buckets.bulk_write(
+            bucket_updates(course_id, at or datetime.utcnow(), deltas),
+            ordered=False,
+            session=session
+        )
+
+    async def series(
+        self,
+        granularity: str,
+        start: datetime,
+        end: datetime,
+        course_id: Optional[str] = None,
+        category: Optional[str] = None,
+        group_by: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Metric totals per period in [start, end), optionally split by course or category"""
+        match: Dict[str, Any] = {
+            "granularity": granularity,
+            "period_start": {"$gte": period_start(granularity, start), "$lt": end}
+        }
+
+        categories = {}
+        if category or group_by == "category":
+            async for course in self._db.courses.find({}, {"category": 1}):
+                categories[str(course['_id'])] = course.get('category')
+        if category:
+            match["course_id"] = {"$in": [c for c, cat in categories.items() if cat == category]}
+        if course_id:
+            match["course_id"] = course_id
+
+        key = "$course_id" if group_by in ("course", "category") else None
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {"period": "$period_start", "key": key},
+                **{metric: {"$sum": f"${metric}"} for metric in METRICS}
+            }}
+        ]
+
+        # Fold course rows into their category when grouping by category
+        rows: Dict[Any, Dict[str, Any]] = {}
+        async for doc in self._db.analytics_buckets.aggregate(pipeline):
+            group_key = doc['_id']['key']
+            if group_by == "category":
+                group_key = categories.get(group_key)
+            row = rows.setdefault((doc['_id']['period'], group_key), {
+                "period": doc['_id']['period'].strftime("%Y-%m-%d"),
+                **({group_by: group_key} if group_by in ("course", "category") else {}),
+                **{metric: 0 for metric in METRICS}
+            })
+            for metric in METRICS:
+                row[metric] += doc.get(metric, 0)
+
+        return [rows[k] for k in sorted(rows, key=lambda k: (k[0], str(k[1])))]
+
+    async def rebuild(self):
+        """Recompute every bucket from the raw collections (backfill / repair)"""
+        await self._db.analytics_buckets.delete_many({})
+        updates = []
+
+        async for e in self._db.enrollments.find({}, {"course_id": 1, "enrolled_at": 1, "completed_at": 1}):
+            if e.get('enrolled_at'):
+                updates += bucket_updates(e['course_id'], e['enrolled_at'], {"enrollments": 1})
+            if e.get('completed_at'):
+                updates += bucket_updates(e['course_id'], e['completed_at'], {"completions": 1})
+
+        async for o in self._db.payment_orders.find({"status": "paid"}, {"course_id": 1, "amount": 1, "paid_at": 1, "created_at": 1}):
+            at = o.get('paid_at') or o.get('created_at')
+            if at:
+                updates += bucket_updates(o['course_id'], at, {"revenue_inr": o.get('amount', 0)})
+
+        async for t in self._db.payment_transactions.find({"payment_status": "paid"}, {"course_id": 1, "amount": 1, "paid_at": 1, "created_at": 1}):
+            at = t.get('paid_at') or t.get('created_at')
+            if at:
+                updates += bucket_updates(t['course_id'], at, {"revenue_usd": t.get('amount', 0)})
+
+        async for c in self._db.certificates.find({}, {"course_id": 1, "issued_date": 1}):
+            if c.get('issued_date'):
+                updates += bucket_updates(c['course_id'], c['issued_date'], {"certificates": 1})
+
+        for i in range(0, len(updates), 1000):
+            await self._db.analytics_buckets.bulk_write(updates[i:i + 1000], ordered=False)
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable
+
+import jwt
+from jwt import InvalidTokenError
+
+__all__ = ["SessionTokens", "InvalidTokenError"]
+
+
+class SessionTokens:
+    """Issues and verifies HS256 session tokens.
+
+    A token carries the user id (`sub`) and the set of enrolled course ids
+    (`courses`) as of issue time, so authenticated requests can be served
+    without a user lookup. Tokens are re-issued by `/auth/refresh`.
+
+    `courses` is advisory only: purchases do not re-issue the token, so the
+    claim misses every enrollment since login or the last refresh. Never
+    use it for authorization; access checks must read `enrollments`.
+    """
+
+    algorithm = "HS256"
+
+    def __init__(self, secret: str, ttl: int = 7 * 24 * 3600):
+        self._secret = secret
+        self._ttl = ttl
+
+    def issue(self, user_id: str, enrolled_courses: Iterable[str] = ()) -> str:
+        now = datetime.utcnow()
+        payload = {
+            "sub": user_id,
+            "courses": sorted(set(enrolled_courses)),
+            "iat": now,
+            "exp": now + timedelta(seconds=self._ttl)
+        }
+        return jwt.encode(payload, self._secret, algorithm=self.algorithm)
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Return the token claims; raises InvalidTokenError if forged or expired"""
+        return jwt.decode(
+            token,
+            self._secret,
+            algorithms=[self.algorithm],
+            options={"require": ["sub", "exp"]}
+        )
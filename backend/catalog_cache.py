@@ -0,0 +1,58 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from cachetools import TTLCache
+
+
+class CatalogCache:
+    """In-process TTL + LRU cache for course catalog reads.
+
+    Concurrent misses on the same key share a single loader call. Writes to
+    the catalog must call `invalidate` or `clear`; other workers only pick up
+    changes once their own entries expire. Also used as a short-lived
+    single-flight cache for upstream payment status checks.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._generation = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, loading it at most once if missing"""
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+
+        # Shield so one cancelled caller does not cancel the shared load
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        generation = self._generation
+        try:
+            value = await loader()
+            # Drop results that raced with an invalidation
+            if generation == self._generation:
+                self._cache[key] = value
+            return value
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    def invalidate(self, key: Hashable):
+        """Drop a single key"""
+        self._generation += 1
+        self._cache.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def clear(self):
+        """Drop every cached entry"""
+        self._generation += 1
+        self._cache.clear()
+        self._inflight.clear()
@@ -0,0 +1,174 @@
+import zlib
+from typing import Dict, Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from static_pages import preferred_encoding
+
+try:
+    import brotli
+except ImportError:  # gzip only without the package
+    brotli = None
+
+DEFAULT_CONTENT_TYPES = (
+    "application/json",
+    "text/html",
+    "text/plain",
+    "text/css",
+    "application/javascript",
+    "image/svg+xml",
+    "application/msgpack",
+)
+
+
+class _Encoder:
+    """Incremental gzip or brotli encoder; `flush` emits everything buffered so far"""
+
+    def __init__(self, coding: str, level: int):
+        self.coding = coding
+        if coding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            # wbits 16 + MAX_WBITS writes a gzip header and trailer
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.coding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        if self.coding == "br":
+            return self._compressor.flush()
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.coding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """gzip / brotli response compression.
+
+    Whole responses are compressed only from `minimum_size` bytes up;
+    streaming responses (more than one body message) are compressed chunk by
+    chunk and flushed after every chunk so clients see data as it is sent.
+    Only content types in `content_types` are touched, and responses that
+    already carry a Content-Encoding (e.g. precompressed policy pages) pass
+    through. `route_levels` maps path prefixes to a level (gzip level and
+    brotli quality), 0 disabling compression for that prefix; the longest
+    matching prefix wins.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        level: int = 6,
+        content_types: Iterable[str] = DEFAULT_CONTENT_TYPES,
+        route_levels: Optional[Dict[str, int]] = None
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        self.content_types = tuple(content_types)
+        self.route_levels = sorted((route_levels or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def _level(self, path: str) -> int:
+        for prefix, level in self.route_levels:
+            if path.startswith(prefix):
+                return level
+        return self.level
+
+    def _coding(self, scope: Scope) -> Optional[str]:
+        codings = ("br", "gzip") if brotli is not None else ("gzip",)
+        return preferred_encoding(Headers(scope=scope).get("accept-encoding"), codings)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        level = self._level(scope["path"])
+        coding = self._coding(scope) if level > 0 else None
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _CompressedResponse(self, coding, level, send).run(self.app, scope, receive)
+
+
+class _CompressedResponse:
+    """Per-request state: holds back the response start until the first body message"""
+
+    def __init__(self, middleware: CompressionMiddleware, coding: str, level: int, send: Send):
+        self.middleware = middleware
+        self.coding = coding
+        self.level = level
+        self.send = send
+        self.start: Optional[Message] = None
+        self.encoder: Optional[_Encoder] = None
+        self.passthrough = False
+
+    async def run(self, app: ASGIApp, scope: Scope, receive: Receive):
+        await app(scope, receive, self.send_wrapper)
+
+    def _compressible(self, headers: Headers) -> bool:
+        if self.start["status"] < 200 or self.start["status"] in (204, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        if "no-transform" in headers.get("cache-control", ""):
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return content_type in self.middleware.content_types
+
+    def _encode_headers(self, headers: MutableHeaders):
+        headers["Content-Encoding"] = self.coding
+        headers.add_vary_header("Accept-Encoding")
+        # The compressed bytes are a different representation of the same content
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+    async def send_wrapper(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            # First body message decides how the whole response is sent
+            headers = MutableHeaders(raw=self.start["headers"])
+            if not self._compressible(headers) or (not more_body and len(body) < self.middleware.minimum_size):
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+
+            self.encoder = _Encoder(self.coding, self.level)
+            self._encode_headers(headers)
+            if more_body:
+                # Streaming: length unknown, send chunked
+                del headers["Content-Length"]
+            else:
+                compressed = self.encoder.compress(body) + self.encoder.finish()
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            await self.send(self.start)
+
+        if more_body:
+            chunk = self.encoder.compress(body) + self.encoder.flush()
+        else:
+            chunk = self.encoder.compress(body) + self.encoder.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import random
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Server error code for transactions on a standalone mongod
+ILLEGAL_OPERATION = 20
+
+TRANSACTION_ATTEMPTS = 5
+TRANSACTION_BACKOFF_SECONDS = 0.05
+
+# (collection name, filter, update) applied alongside the enrollment
+PaymentUpdate = Tuple[str, Dict[str, Any], Dict[str, Any]]
+
+
+class EnrollmentService:
+    """Single write path for turning a payment into an enrollment.
+
+    The enrollment upsert, the user's `enrolled_courses`, the course's
+    `students_count` and the payment record are written in one multi-document
+    transaction. The unique (user_id, course_id) index makes retries and
+    concurrent callers idempotent: only the call that inserts the enrollment
+    touches the counters. On a standalone server without transactions the
+    same writes run in sequence, enrollment first. A retry re-applies the
+    user and payment updates, but not `students_count`: if an attempt fails
+    between inserting the enrollment and incrementing it, that increment is
+    lost. Nothing reconciles `students_count`, since seeded courses start
+    from display figures rather than counted enrollments.
+    """
+
+    def __init__(self, client, db, stats=None, analytics=None):
+        self._client = client
+        self._db = db
+        self._stats = stats
+        self._analytics = analytics
+        self._transactions = True
+
+    async def enroll(
+        self,
+        user_id: str,
+        course_id: str,
+        idempotency_key: str,
+        source: str,
+        payment_update: Optional[PaymentUpdate] = None,
+        revenue: Optional[Dict[str, float]] = None
+    ) -> bool:
+        """Enroll the user; returns False if they were already enrolled.
+
+        `revenue` (e.g. {"revenue_inr": 999}) is added to the stats rollup
+        and analytics buckets only when `payment_update` actually changed the
+        payment record.
+        """
+        created, paid = await self._write_enrollment(user_id, course_id, idempotency_key, source, payment_update)
+        await self._count(course_id, created, revenue if paid else None)
+        return created
+
+    async def _write_enrollment(self, user_id, course_id, idempotency_key, source, payment_update) -> Tuple[bool, bool]:
+        if self._transactions:
+            for attempt in range(1, TRANSACTION_ATTEMPTS + 1):
+                try:
+                    async with await self._client.start_session() as session:
+                        async with session.start_transaction():
+                            return await self._write(user_id, course_id, idempotency_key, source, payment_update, session)
+                except DuplicateKeyError:
+                    # A concurrent caller inserted the enrollment; the retry sees it and skips the counters
+                    if attempt == TRANSACTION_ATTEMPTS:
+                        raise
+                except OperationFailure as e:
+                    if e.code == ILLEGAL_OPERATION:
+                        logger.warning("MongoDB transactions unavailable, enrolling without a transaction")
+                        self._transactions = False
+                        return await self._write(user_id, course_id, idempotency_key, source, payment_update, None)
+                    # Every write is idempotent, so an unknown commit result is retried like a conflict
+                    retryable = e.has_error_label("TransientTransactionError") or e.has_error_label("UnknownTransactionCommitResult")
+                    if not retryable or attempt == TRANSACTION_ATTEMPTS:
+                        logger.error(f"Enrollment of {user_id} in {course_id} failed after {attempt} attempts: {e!r}")
+                        raise
+                # Exponential backoff with jitter so conflicting purchases spread out
+                await asyncio.sleep(TRANSACTION_BACKOFF_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+        return await self._write(user_id, course_id, idempotency_key, source, payment_update, None)
+
+    async def _count(self, course_id: str, created: bool, revenue: Optional[Dict[str, float]]):
+        """Apply the rollup and analytics increments after commit.
+
+        The global stats document and the course's current buckets are
+        written by every purchase, so updating them inside the transaction
+        makes concurrent enrollments conflict. An increment lost to a crash
+        here is repaired by the stats reconcile / analytics rebuild.
+        """
+        if not created and not revenue:
+            return
+        if self._stats:
+            try:
+                await self._stats.increment(**({"total_enrollments": 1} if created else {}), **(revenue or {}))
+            except Exception as e:
+                logger.error(f"Stats increment failed, left to reconciliation: {e!r}")
+        if self._analytics:
+            try:
+                await self._analytics.record(course_id, **({"enrollments": 1} if created else {}), **(revenue or {}))
+            except Exception as e:
+                logger.error(f"Analytics record failed for {course_id}, left to rebuild: {e!r}")
+
+    async def _write(self, user_id, course_id, idempotency_key, source, payment_update, session) -> Tuple[bool, bool]:
+        """Returns (enrollment created, payment record changed)"""
+        now = datetime.utcnow()
+        try:
+            result = await self._db.enrollments.update_one(
+                {"user_id": user_id, "course_id": course_id},
+                {
+                    "$setOnInsert": {
+                        "progress": 0.0,
+                        "completed_lessons": [],
+                        "enrolled_at": now,
+                        "source": source,
+                        "idempotency_key": idempotency_key
+                    }
+                },
+                upsert=True,
+                session=session
+            )
+            created = result.upserted_id is not None
+        except DuplicateKeyError:
+            # Inside a transaction the whole attempt has to be retried by enroll()
+            if session is not None:
+                raise
+            # A concurrent upsert inserted the same enrollment first
+            created = False
+
+        # Idempotent, so safe to repeat on every retry
+        await self._db.users.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$addToSet": {"enrolled_courses": course_id}},
+            session=session
+        )
+
+        if created:
+            await self._db.courses.update_one(
+                {"_id": ObjectId(course_id)},
+                {"$inc": {"students_count": 1}},
+                session=session
+            )
+
+        paid = False
+        if payment_update:
+            collection, query, update = payment_update
+            result = await self._db[collection].update_one(query, update, session=session)
+            paid = bool(result.modified_count)
+
+        return created, paid
+
+
+async def migrate_enrollments(db):
+    """Prepare enrollments for the unique (user_id, course_id) index"""
+    await merge_duplicate_enrollments(db)
+
+    # Earlier versions created this index without the unique option
+    existing = (await db.enrollments.index_information()).get("user_id_1_course_id_1")
+    if existing and not existing.get("unique"):
+        await db.enrollments.drop_index("user_id_1_course_id_1")
+
+
+async def merge_duplicate_enrollments(db) -> int:
+    """Collapse duplicate (user_id, course_id) enrollments into one document.
+
+    Keeps the earliest enrollment, merges completed lessons and the highest
+    progress into it and deletes the rest. Needed once before the unique
+    index can be built on data written by older versions.
+    """
+    removed = 0
+    duplicates = db.enrollments.aggregate([
+        {"$group": {
+            "_id": {"user_id": "$user_id", "course_id": "$course_id"},
+            "ids": {"$push": "$_id"},
+            "count": {"$sum": 1}
+        }},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+
+    async for group in duplicates:
+        docs = await db.enrollments.find({"_id": {"$in": group['ids']}}).sort("_id", 1).to_list(None)
+        keep, extras = docs[0], docs[1:]
+
+        completed = list(keep.get('completed_lessons', []))
+        for doc in extras:
+            completed.extend(l for l in doc.get('completed_lessons', []) if l not in completed)
+
+        await db.enrollments.update_one(
+            {"_id": keep['_id']},
+            {"$set": {
+                "completed_lessons": completed,
+                "progress": max(d.get('progress', 0) or 0 for d in docs)
+            }}
+        )
+        result = await db.enrollments.delete_many({"_id": {"$in": [d['_id'] for d in extras]}})
+        removed += result.deleted_count
+
+    if removed:
+        logger.warning(f"Removed {removed} duplicate enrollments")
+    return removed
@@ -0,0 +1,41 @@
+import hashlib
+from typing import Any, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from serialization import dumps
+
+
+def make_etag(content: Any) -> str:
+    """Strong ETag from the hash of a response body (bytes, str or JSON-able data).
+
+    JSON data is hashed in canonical form, so the tag is the same on every
+    worker and survives cache reloads as long as the content is unchanged.
+    """
+    if isinstance(content, str):
+        content = content.encode()
+    elif not isinstance(content, bytes):
+        content = dumps(content, sort_keys=True)
+    return f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names `etag`"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    tags = (tag.strip() for tag in header.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+def conditional(request: Request, response: Response, etag: str, cache_control: str) -> Optional[Response]:
+    """Set validator headers on `response`; returns a 304 to send instead if the client is current"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers={**response.headers, **headers})
+    response.headers.update(headers)
+    return None
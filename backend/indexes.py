@@ -0,0 +1,104 @@
+import logging
+from typing import Any, Dict, List, Tuple
+
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Every index the API relies on, declared in one place.
+# (collection, keys, options)
+INDEXES: List[Tuple[str, List[Tuple[str, int]], Dict[str, Any]]] = [
+    ("users", [("phone", ASCENDING)], {"unique": True}),
+    ("enrollments", [("user_id", ASCENDING), ("course_id", ASCENDING)], {"unique": True}),
+    ("enrollments", [("course_id", ASCENDING)], {}),
+    ("certificates", [("certificate_id", ASCENDING)], {"unique": True}),
+    ("certificates", [("user_id", ASCENDING), ("course_id", ASCENDING)], {"unique": True}),
+    ("payment_orders", [("order_id", ASCENDING)], {"unique": True}),
+    ("payment_transactions", [("session_id", ASCENDING)], {"unique": True}),
+    ("live_classes", [("date_time", ASCENDING)], {}),
+    ("live_class_bookings", [("class_id", ASCENDING), ("user_id", ASCENDING)], {"unique": True}),
+    ("live_class_bookings", [("class_id", ASCENDING), ("status", ASCENDING), ("created_at", ASCENDING)], {}),
+    ("live_class_bookings", [("user_id", ASCENDING), ("status", ASCENDING), ("class_id", ASCENDING)], {}),
+    ("analytics_buckets", [("granularity", ASCENDING), ("period_start", ASCENDING)], {}),
+    ("otp_codes", [("phone", ASCENDING)], {"unique": True}),
+    ("otp_codes", [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+]
+
+DUPLICATE_KEY = 11000
+INDEX_OPTIONS_CONFLICT = 85
+INDEX_KEY_SPECS_CONFLICT = 86
+
+# Options compared when checking an existing index against its declaration
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+class IndexConflictError(RuntimeError):
+    """A unique index cannot be built because the collection holds duplicates"""
+
+
+def index_name(keys: List[Tuple[str, int]]) -> str:
+    """Default MongoDB index name for a key pattern"""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+def _drift(existing: Dict[str, Any], keys: List[Tuple[str, int]], options: Dict[str, Any]) -> List[str]:
+    differences = []
+    existing_keys = [(field, int(direction)) for field, direction in existing.get("key", [])]
+    if existing_keys != list(keys):
+        differences.append(f"keys {existing_keys} != {list(keys)}")
+    for option in COMPARED_OPTIONS:
+        if existing.get(option) != options.get(option):
+            differences.append(f"{option} {existing.get(option)!r} != {options.get(option)!r}")
+    return differences
+
+
+async def ensure_indexes(db, indexes=INDEXES) -> Dict[str, List[str]]:
+    """Create missing indexes and report drift from the declared set.
+
+    Existing indexes that differ from their declaration are reported, never
+    dropped. Raises IndexConflictError when a unique index conflicts with
+    duplicate documents so the app refuses to start.
+    """
+    report: Dict[str, List[str]] = {"created": [], "drifted": [], "unmanaged": []}
+    declared: Dict[str, set] = {}
+
+    for collection_name, keys, options in indexes:
+        collection = db[collection_name]
+        name = options.get("name", index_name(keys))
+        declared.setdefault(collection_name, set()).add(name)
+
+        existing = (await collection.index_information()).get(name)
+        if existing:
+            differences = _drift(existing, keys, options)
+            if differences:
+                report["drifted"].append(f"{collection_name}.{name}: {'; '.join(differences)}")
+            continue
+
+        try:
+            await collection.create_index(keys, **{**options, "name": name})
+        except OperationFailure as e:
+            if e.code == DUPLICATE_KEY:
+                raise IndexConflictError(
+                    f"Cannot create unique index {collection_name}.{name}: duplicate documents exist ({e})"
+                ) from e
+            if e.code in (INDEX_OPTIONS_CONFLICT, INDEX_KEY_SPECS_CONFLICT):
+                # Same keys already indexed under another name or with other options
+                report["drifted"].append(f"{collection_name}.{name}: {e}")
+                continue
+            raise
+        report["created"].append(f"{collection_name}.{name}")
+
+    for collection_name, names in declared.items():
+        for name in await db[collection_name].index_information():
+            if name != "_id_" and name not in names:
+                report["unmanaged"].append(f"{collection_name}.{name}")
+
+    for entry in report["created"]:
+        logger.info(f"Created index {entry}")
+    for entry in report["drifted"]:
+        logger.warning(f"Index drift on {entry}")
+    for entry in report["unmanaged"]:
+        logger.info(f"Unmanaged index {entry}")
+
+    return report
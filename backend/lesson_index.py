@@ -0,0 +1,74 @@
+import copy
+import hashlib
+import json
+import re
+from typing import Any, Dict, List, Tuple
+
+_MINUTES = re.compile(r"\d+")
+
+# Bumped whenever the index is computed differently, so stored indexes are rebuilt
+INDEX_VERSION = 2
+
+
+def _duration_minutes(value: Any) -> int:
+    """Accept 30 or "15 mins" style durations"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        match = _MINUTES.search(value)
+        if match:
+            return int(match.group())
+    return 0
+
+
+def content_hash(lessons: List[Dict[str, Any]]) -> str:
+    payload = json.dumps(lessons, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def build_lesson_index(lessons: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Flatten a course syllabus into its trackable lessons.
+
+    Courses store lessons either as a flat list of lesson objects, or as
+    wrapper objects such as {"type": "theory", "modules": [...]} and
+    {"type": "practical", "videos": [...]}. Every module and video inside a
+    wrapper counts as one lesson. Items without an `id` get a stable one
+    (e.g. "practical-3") so players can report progress against it.
+
+    Returns the lessons with ids filled in, and the index stored on the
+    course as `lesson_index`; `durations` (minutes) is aligned with
+    `lesson_ids`.
+    """
+    lessons = copy.deepcopy(lessons)
+    lesson_ids = []
+    durations = []
+
+    def add(item: Dict[str, Any], default_id: str):
+        lesson_id = str(item.setdefault("id", default_id))
+        if lesson_id in lesson_ids:
+            return
+        lesson_ids.append(lesson_id)
+        durations.append(_duration_minutes(item.get("duration")))
+
+    for position, lesson in enumerate(lessons, start=1):
+        if not isinstance(lesson, dict):
+            continue
+        # A wrapper is a wrapper even when empty; it is never a lesson itself
+        if "modules" in lesson or "videos" in lesson:
+            children = lesson.get("modules") or lesson.get("videos") or []
+            prefix = lesson.get("type") or f"section{position}"
+            for number, child in enumerate(children if isinstance(children, list) else [], start=1):
+                if isinstance(child, dict):
+                    add(child, f"{prefix}-{number}")
+        else:
+            add(lesson, f"lesson{position}")
+
+    index = {
+        "lesson_ids": lesson_ids,
+        "durations": durations,
+        "count": len(lesson_ids),
+        "total_duration": sum(durations),
+        "content_hash": content_hash(lessons),
+        "version": INDEX_VERSION
+    }
+    return lessons, index
@@ -0,0 +1,211 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+BOOKED = "booked"
+WAITLISTED = "waitlisted"
+
+
+class BookingError(Exception):
+    """A booking request that cannot be honoured, with the HTTP status to report"""
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+class LiveClassBookings:
+    """Live class seats and waitlists, one `live_class_bookings` document per user and class.
+
+    Capacity is enforced by a guarded `$inc` of `seats_taken` on the class
+    document; the unique (class_id, user_id) index keeps a user to a single
+    booking. A seat reserved for a booking that then turns out to be a
+    duplicate is released again.
+    """
+
+    def __init__(self, db):
+        self._db = db
+
+    async def _reserve_seat(self, class_id: ObjectId) -> bool:
+        result = await self._db.live_classes.update_one(
+            {"_id": class_id, "$expr": {"$lt": [{"$ifNull": ["$seats_taken", 0]}, "$max_participants"]}},
+            {"$inc": {"seats_taken": 1}}
+        )
+        return bool(result.modified_count)
+
+    async def _release_seat(self, class_id: ObjectId):
+        await self._db.live_classes.update_one(
+            {"_id": class_id, "seats_taken": {"$gt": 0}},
+            {"$inc": {"seats_taken": -1}}
+        )
+
+    async def book(self, class_id: ObjectId, user_id: str, join_waitlist: bool = False) -> Dict[str, Any]:
+        """Take a seat, or join the waitlist when the class is full and `join_waitlist` is set"""
+        now = datetime.utcnow()
+
+        if await self._reserve_seat(class_id):
+            # Inserts a new booking or upgrades the user's waitlist entry; an
+            # existing confirmed booking fails the upsert on the unique index
+            for _ in range(2):
+                try:
+                    await self._db.live_class_bookings.update_one(
+                        {"class_id": class_id, "user_id": user_id, "status": {"$ne": BOOKED}},
+                        {"$set": {"status": BOOKED, "booked_at": now}, "$setOnInsert": {"created_at": now}},
+                        upsert=True
+                    )
+                    return {"status": BOOKED}
+                except DuplicateKeyError:
+                    continue
+            await self._release_seat(class_id)
+            # A concurrent request may have been waitlisted while this seat was held
+            await self.promote(class_id)
+            raise BookingError("Already booked this class")
+
+        # Work out why no seat could be reserved
+        if not await self._db.live_classes.find_one({"_id": class_id}, {"_id": 1}):
+            raise BookingError("Live class not found", 404)
+        existing = await self._db.live_class_bookings.find_one({"class_id": class_id, "user_id": user_id})
+        if existing and existing['status'] == BOOKED:
+            raise BookingError("Already booked this class")
+        if not join_waitlist:
+            raise BookingError("Class is full")
+        if existing:
+            raise BookingError("Already on the waitlist for this class")
+
+        try:
+            await self._db.live_class_bookings.insert_one(
+                {"class_id": class_id, "user_id": user_id, "status": WAITLISTED, "created_at": now}
+            )
+        except DuplicateKeyError:
+            raise BookingError("Already on the waitlist for this class")
+
+        # A seat may have freed up between the two writes
+        await self.promote(class_id)
+        position = await self.waitlist_position(class_id, user_id)
+        if position is None:
+            return {"status": BOOKED}
+        return {"status": WAITLISTED, "position": position}
+
+    async def cancel(self, class_id: ObjectId, user_id: str) -> str:
+        """Remove the user's booking or waitlist entry; returns the status it had"""
+        booking = await self._db.live_class_bookings.find_one_and_delete({"class_id": class_id, "user_id": user_id})
+        if not booking:
+            raise BookingError("No booking found for this class", 404)
+        if booking['status'] == BOOKED:
+            await self._release_seat(class_id)
+            await self.promote(class_id)
+        return booking['status']
+
+    async def promote(self, class_id: ObjectId):
+        """Move waitlisted users into free seats, first come first served"""
+        while await self._db.live_class_bookings.find_one({"class_id": class_id, "status": WAITLISTED}, {"_id": 1}):
+            if not await self._reserve_seat(class_id):
+                return
+            promoted = await self._db.live_class_bookings.find_one_and_update(
+                {"class_id": class_id, "status": WAITLISTED},
+                {"$set": {"status": BOOKED, "booked_at": datetime.utcnow()}},
+                sort=[("created_at", 1)]
+            )
+            if not promoted:
+                # The waitlist emptied concurrently
+                await self._release_seat(class_id)
+                return
+
+    async def waitlist_position(self, class_id: ObjectId, user_id: str) -> Optional[int]:
+        entry = await self._db.live_class_bookings.find_one(
+            {"class_id": class_id, "user_id": user_id, "status": WAITLISTED}, {"created_at": 1}
+        )
+        if not entry:
+            return None
+        ahead = await self._db.live_class_bookings.count_documents(
+            {"class_id": class_id, "status": WAITLISTED, "created_at": {"$lt": entry['created_at']}}
+        )
+        return ahead + 1
+
+    async def waitlist_counts(self, class_ids: Iterable[ObjectId]) -> Dict[ObjectId, int]:
+        counts = self._db.live_class_bookings.aggregate([
+            {"$match": {"class_id": {"$in": list(class_ids)}, "status": WAITLISTED}},
+            {"$group": {"_id": "$class_id", "count": {"$sum": 1}}}
+        ])
+        return {doc['_id']: doc['count'] async for doc in counts}
+
+    async def statuses(self, user_id: str, class_ids: Iterable[ObjectId]) -> Dict[ObjectId, str]:
+        """The caller's booking status for each of the given classes they have one for"""
+        bookings = self._db.live_class_bookings.find(
+            {"user_id": user_id, "class_id": {"$in": list(class_ids)}}, {"class_id": 1, "status": 1}
+        )
+        return {b['class_id']: b['status'] async for b in bookings}
+
+    async def booked_class_ids(self, user_id: str) -> List[ObjectId]:
+        bookings = self._db.live_class_bookings.find({"user_id": user_id, "status": BOOKED}, {"class_id": 1})
+        return [b['class_id'] async for b in bookings]
+
+
+async def migrate_live_class_bookings(db):
+    """Move embedded `enrolled_users` / `waitlist` arrays into `live_class_bookings`.
+
+    Idempotent: bookings are upserted, then the arrays are removed and
+    `seats_taken` is recomputed from the bookings collection. Every worker
+    runs it at startup, so the unique (class_id, user_id) index must exist
+    first; upserts that lose a race to another worker are ignored.
+    """
+    migrated = 0
+    legacy = db.live_classes.find(
+        {"$or": [
+            {"enrolled_users": {"$exists": True}},
+            {"waitlist": {"$exists": True}},
+            {"seats_taken": {"$exists": False}}
+        ]},
+        {"enrolled_users": 1, "waitlist": 1}
+    )
+
+    async for live_class in legacy:
+        class_id = live_class['_id']
+        now = datetime.utcnow()
+        enrolled = live_class.get('enrolled_users') or []
+        updates = [
+            UpdateOne(
+                {"class_id": class_id, "user_id": user_id},
+                {"$setOnInsert": {"status": BOOKED, "created_at": now, "booked_at": now}},
+                upsert=True
+            )
+            for user_id in enrolled
+        ]
+        # Space the timestamps so the waitlist keeps its order
+        updates += [
+            UpdateOne(
+                {"class_id": class_id, "user_id": user_id},
+                {"$setOnInsert": {"status": WAITLISTED, "created_at": now + timedelta(milliseconds=i)}},
+                upsert=True
+            )
+            for i, user_id in enumerate(u for u in live_class.get('waitlist') or [] if u not in enrolled)
+        ]
+        if updates:
+            try:
+                await db.live_class_bookings.bulk_write(updates, ordered=False)
+            except BulkWriteError as e:
+                # Concurrent upserts of the same booking from another worker
+                if any(error['code'] != DUPLICATE_KEY for error in e.details['writeErrors']):
+                    raise
+
+        seats_taken = await db.live_class_bookings.count_documents({"class_id": class_id, "status": BOOKED})
+        await db.live_classes.update_one(
+            {"_id": class_id},
+            {"$set": {"seats_taken": seats_taken}, "$unset": {"enrolled_users": "", "waitlist": ""}}
+        )
+        migrated += 1
+
+    # Multikey index over the removed array
+    if "enrolled_users_1" in await db.live_classes.index_information():
+        await db.live_classes.drop_index("enrolled_users_1")
+
+    if migrated:
+        logger.warning(f"Migrated bookings of {migrated} live classes to live_class_bookings")
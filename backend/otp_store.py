@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from cachetools import TTLCache
+
+
+class OTPStore:
+    """Storage for one-time passwords keyed by phone number"""
+
+    async def put(self, phone: str, otp: str):
+        raise NotImplementedError
+
+    async def consume(self, phone: str, otp: str) -> bool:
+        """Remove and accept the OTP if it matches and has not expired"""
+        raise NotImplementedError
+
+
+class MemoryOTPStore(OTPStore):
+    """Per-process store; only usable with a single worker"""
+
+    def __init__(self, ttl: int = 600, maxsize: int = 10000):
+        # TTLCache expires entries and evicts the least recently used when full
+        self._codes = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def put(self, phone: str, otp: str):
+        self._codes[phone] = otp
+
+    async def consume(self, phone: str, otp: str) -> bool:
+        if self._codes.get(phone) != otp:
+            return False
+        self._codes.pop(phone, None)
+        return True
+
+
+class MongoOTPStore(OTPStore):
+    """Shared store backed by a collection with a TTL index on `expires_at`"""
+
+    def __init__(self, collection, ttl: int = 600):
+        self._collection = collection
+        self._ttl = ttl
+
+    async def put(self, phone: str, otp: str):
+        await self._collection.update_one(
+            {"phone": phone},
+            {"$set": {"otp": otp, "expires_at": datetime.utcnow() + timedelta(seconds=self._ttl)}},
+            upsert=True
+        )
+
+    async def consume(self, phone: str, otp: str) -> bool:
+        # The TTL monitor only runs periodically, so expiry is also checked here
+        doc = await self._collection.find_one_and_delete({
+            "phone": phone,
+            "otp": otp,
+            "expires_at": {"$gt": datetime.utcnow()}
+        })
+        return doc is not None
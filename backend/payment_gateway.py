@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+import requests
+from urllib3.exceptions import ProtocolError
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentGatewayError(Exception):
+    """The gateway rejected the request or could not be reached"""
+
+
+class PaymentGateway:
+    """Order creation and signature checks for an INR payment provider"""
+
+    key_id: str
+
+    async def create_order(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def verify_payment_signature(self, order_id: str, payment_id: str, signature: str):
+        """Raise PaymentGatewayError unless the checkout signature is valid"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _expected_signature(secret: str, order_id: str, payment_id: str) -> str:
+    return hmac.new(secret.encode(), f"{order_id}|{payment_id}".encode(), hashlib.sha256).hexdigest()
+
+
+class RazorpayGateway(PaymentGateway):
+    """Razorpay client calls run on a bounded thread pool with timeout and retry"""
+
+    def __init__(
+        self,
+        key_id: str,
+        key_secret: str,
+        max_workers: int = 4,
+        timeout: float = 10,
+        max_attempts: int = 3,
+        backoff: float = 0.5
+    ):
+        import razorpay
+        from razorpay.errors import ServerError
+
+        self.key_id = key_id
+        self._key_secret = key_secret
+        self._client = razorpay.Client(auth=(key_id, key_secret))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="razorpay")
+        self._timeout = timeout
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        # Only network failures and 5xx responses are worth retrying
+        self._retryable = (
+            asyncio.TimeoutError,
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            ServerError
+        )
+        self._server_error = ServerError
+
+    def _unsent(self, error: Exception) -> bool:
+        """Whether the request certainly never reached Razorpay, or was refused with a 5xx"""
+        if isinstance(error, (requests.exceptions.ConnectTimeout, self._server_error)):
+            return True
+        # A connection dropped mid-exchange is wrapped ProtocolError ("Connection aborted")
+        return isinstance(error, requests.exceptions.ConnectionError) and not isinstance(
+            error.args[0] if error.args else None, ProtocolError
+        )
+
+    async def _call(self, func, *args, idempotent: bool = True, **kwargs):
+        """Run a client call off the event loop, retrying network failures and 5xx responses.
+
+        Calls that are not `idempotent` are only retried when the request
+        cannot have been processed; after a read timeout Razorpay may already
+        have acted on it.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, self._max_attempts + 1):
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, lambda: func(*args, **kwargs)),
+                    timeout=self._timeout
+                )
+            except self._retryable as e:
+                if not idempotent and not self._unsent(e):
+                    raise PaymentGatewayError(f"Razorpay call outcome unknown: {e!r}") from e
+                if attempt == self._max_attempts:
+                    raise PaymentGatewayError(f"Razorpay unavailable after {attempt} attempts: {e!r}") from e
+                delay = self._backoff * 2 ** (attempt - 1)
+                logger.warning(f"Razorpay call failed ({e!r}), retrying in {delay}s")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                raise PaymentGatewayError(str(e)) from e
+
+    async def create_order(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        # order.create is a plain POST; a blind retry can create a second order
+        return await self._call(self._client.order.create, data=data, timeout=self._timeout, idempotent=False)
+
+    def verify_payment_signature(self, order_id: str, payment_id: str, signature: str):
+        # Pure HMAC check with no network call, so it runs inline
+        if not hmac.compare_digest(_expected_signature(self._key_secret, order_id, payment_id), signature):
+            raise PaymentGatewayError("Razorpay signature verification failed")
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class LocalGateway(PaymentGateway):
+    """In-process stand-in for Razorpay, for benchmarks and local development.
+
+    Orders are created without any network call and signatures use the same
+    HMAC scheme, so `sign` can produce valid checkout callbacks.
+    """
+
+    def __init__(self, key_id: str = "rzp_local", key_secret: str = "local_secret"):
+        self.key_id = key_id
+        self._key_secret = key_secret
+
+    async def create_order(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": f"order_local_{secrets.token_hex(7)}",
+            "entity": "order",
+            "amount": data["amount"],
+            "currency": data.get("currency", "INR"),
+            "receipt": data.get("receipt"),
+            "notes": data.get("notes", {}),
+            "status": "created"
+        }
+
+    def sign(self, order_id: str, payment_id: str) -> str:
+        return _expected_signature(self._key_secret, order_id, payment_id)
+
+    def verify_payment_signature(self, order_id: str, payment_id: str, signature: str):
+        if not hmac.compare_digest(self.sign(order_id, payment_id), signature):
+            raise PaymentGatewayError("Signature verification failed")
@@ -1,11 +1,14 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
 
+from static_pages import StaticPage
+
 policy_router = APIRouter()
 
-@policy_router.get("/refund-policy", response_class=HTMLResponse)
-async def refund_policy():
-    return """
+# Pages only change on deploy; clients keep them a day and then revalidate by ETag
+POLICY_CACHE_CONTROL = "public, max-age=86400, stale-while-revalidate=604800"
+
+REFUND_POLICY_HTML = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -54,9 +57,7 @@ async def refund_policy():
     </html>
     """
 
-@policy_router.get("/terms-and-conditions", response_class=HTMLResponse)
-async def terms_conditions():
-    return """
+TERMS_CONDITIONS_HTML = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -108,9 +109,7 @@ async def terms_conditions():
     </html>
     """
 
-@policy_router.get("/shipping-policy", response_class=HTMLResponse)
-async def shipping_policy():
-    return """
+SHIPPING_POLICY_HTML = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -152,9 +151,7 @@ async def shipping_policy():
     </html>
     """
 
-@policy_router.get("/privacy-policy", response_class=HTMLResponse)
-async def privacy_policy():
-    return """
+PRIVACY_POLICY_HTML = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -224,9 +221,7 @@ async def privacy_policy():
     </html>
     """
 
-@policy_router.get("/contact-us", response_class=HTMLResponse)
-async def contact_us():
-    return """
+CONTACT_US_HTML = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -289,3 +284,31 @@ async def contact_us():
     </body>
     </html>
     """
+
+# Rendered and compressed once at import, then served straight from memory
+REFUND_POLICY = StaticPage.render(REFUND_POLICY_HTML)
+TERMS_CONDITIONS = StaticPage.render(TERMS_CONDITIONS_HTML)
+SHIPPING_POLICY = StaticPage.render(SHIPPING_POLICY_HTML)
+PRIVACY_POLICY = StaticPage.render(PRIVACY_POLICY_HTML)
+CONTACT_US = StaticPage.render(CONTACT_US_HTML)
+
+
+@policy_router.get("/refund-policy", response_class=HTMLResponse)
+async def refund_policy(request: Request):
+    return REFUND_POLICY.response(request, POLICY_CACHE_CONTROL)
+
+@policy_router.get("/terms-and-conditions", response_class=HTMLResponse)
+async def terms_conditions(request: Request):
+    return TERMS_CONDITIONS.response(request, POLICY_CACHE_CONTROL)
+
+@policy_router.get("/shipping-policy", response_class=HTMLResponse)
+async def shipping_policy(request: Request):
+    return SHIPPING_POLICY.response(request, POLICY_CACHE_CONTROL)
+
+@policy_router.get("/privacy-policy", response_class=HTMLResponse)
+async def privacy_policy(request: Request):
+    return PRIVACY_POLICY.response(request, POLICY_CACHE_CONTROL)
+
+@policy_router.get("/contact-us", response_class=HTMLResponse)
+async def contact_us(request: Request):
+    return CONTACT_US.response(request, POLICY_CACHE_CONTROL)
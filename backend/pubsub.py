@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Set
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[str, Any], None]
+
+
+class PubSub:
+    """In-process publish/subscribe with an optional cross-worker backend.
+
+    Messages are delivered to local subscribers immediately and handed to the
+    backend, which relays them to the other workers. Slow subscribers drop
+    messages rather than block publishers.
+    """
+
+    def __init__(self, backend=None):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._backend = backend
+
+    async def start(self):
+        if self._backend:
+            await self._backend.start(self._deliver)
+
+    async def stop(self):
+        if self._backend:
+            await self._backend.stop()
+
+    async def publish(self, channel: str, message: Any):
+        self._deliver(channel, message)
+        if self._backend:
+            await self._backend.publish(channel, message)
+
+    def _deliver(self, channel: str, message: Any):
+        for queue in self._subscribers.get(channel, ()):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                logger.warning(f"Dropping message on {channel}: subscriber queue full")
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str, maxsize: int = 64) -> AsyncIterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._subscribers.setdefault(channel, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+
+class MongoPubSubBackend:
+    """Relays messages between workers through a capped collection.
+
+    Each worker tails the collection with a tailable await cursor and skips
+    its own messages, which were already delivered locally. Works on a
+    standalone server (no replica set needed).
+    """
+
+    def __init__(self, db, collection: str = "pubsub_messages", size_bytes: int = 4 * 1024 * 1024):
+        self._db = db
+        self._name = collection
+        self._size_bytes = size_bytes
+        self._origin = uuid.uuid4().hex
+        self._task = None
+
+    async def start(self, deliver: Deliver):
+        try:
+            await self._db.create_collection(self._name, capped=True, size=self._size_bytes)
+        except CollectionInvalid:
+            pass
+
+        collection = self._db[self._name]
+        # Tailable cursors die on an empty collection, so make sure one document exists
+        last = await collection.find_one(sort=[("$natural", -1)])
+        if last is None:
+            result = await collection.insert_one({"origin": self._origin, "channel": None})
+            last = {"_id": result.inserted_id}
+
+        self._task = asyncio.create_task(self._listen(collection, last["_id"], deliver))
+
+    async def _listen(self, collection, last_id, deliver: Deliver):
+        cursor = None
+        while True:
+            try:
+                if cursor is None or not cursor.alive:
+                    # Reopen only once the cursor has died; a fresh query from
+                    # last_id rescans the collection and can skip messages whose
+                    # ids sort below it
+                    cursor = collection.find({"_id": {"$gt": last_id}}, cursor_type=CursorType.TAILABLE_AWAIT)
+                # Iteration stops at every empty await batch while the cursor stays alive
+                async for doc in cursor:
+                    last_id = doc["_id"]
+                    if doc.get("origin") != self._origin and doc.get("channel"):
+                        deliver(doc["channel"], doc.get("message"))
+                if cursor.alive:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Pub/sub listener error: {e!r}")
+                cursor = None
+            # Cursor closed (or failed); reopen after a short pause
+            await asyncio.sleep(1)
+
+    async def publish(self, channel: str, message: Any):
+        await self._db[self._name].insert_one({"origin": self._origin, "channel": channel, "message": message})
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
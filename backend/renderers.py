@@ -0,0 +1,93 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from starlette.requests import Request
+from starlette.responses import Response
+
+from serialization import dumps
+
+try:
+    import msgpack
+except ImportError:  # JSON only without the package
+    msgpack = None
+
+
+class Renderer:
+    """Encodes endpoint results into one media type"""
+    media_type: str
+
+    def render(self, content: Any) -> bytes:
+        raise NotImplementedError
+
+
+class JSONRenderer(Renderer):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _msgpack_default(obj: Any) -> Any:
+    # Same representations as the JSON output, so clients see identical values
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not MessagePack serializable")
+
+
+class MsgPackRenderer(Renderer):
+    media_type = "application/msgpack"
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_msgpack_default)
+
+
+JSON = JSONRenderer()
+
+# Accept media type -> renderer; JSON stays the default
+RENDERERS: Dict[str, Renderer] = {"application/json": JSON}
+if msgpack is not None:
+    RENDERERS["application/msgpack"] = RENDERERS["application/x-msgpack"] = MsgPackRenderer()
+
+
+def _accepted_media_types(accept: Optional[str]) -> List[str]:
+    """Media types from an Accept header, most preferred first (q=0 dropped)"""
+    weighted = []
+    for position, part in enumerate((accept or "").split(",")):
+        media_type, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type and q > 0:
+            weighted.append((-q, position, media_type.lower()))
+    return [media_type for _, _, media_type in sorted(weighted)]
+
+
+def negotiate(request: Request) -> Renderer:
+    """Renderer for the client's most preferred supported media type"""
+    for media_type in _accepted_media_types(request.headers.get("accept")):
+        renderer = RENDERERS.get(media_type)
+        if renderer is not None:
+            return renderer
+    return JSON
+
+
+def rendered_response(body: bytes, renderer: Renderer, response: Optional[Response] = None) -> Response:
+    """Response for an already rendered body, carrying over headers set on the injected `response`"""
+    headers = {"vary": "Accept"}
+    if response is not None:
+        headers.update((k, v) for k, v in response.headers.items() if k != "content-length")
+    return Response(body, media_type=renderer.media_type, headers=headers)
+
+
+def render_response(request: Request, content: Any, response: Optional[Response] = None) -> Response:
+    """Encode `content` in the negotiated media type"""
+    renderer = negotiate(request)
+    return rendered_response(renderer.render(content), renderer, response)
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Set
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from pubsub import PubSub
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "live-class-seats"
+
+# Server error code for $changeStream on a standalone mongod
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+
+class SeatAvailabilityFeed:
+    """Coalesced seat-count updates for live classes.
+
+    Changed classes are collected into a set and flushed at most once per
+    `interval`: one query reads the current counts of every class touched in
+    that window and the batch goes out as a single frame, so a burst of
+    bookings becomes a handful of frames. Changes come from a change stream on
+    `live_classes` when the server supports one (replica set), otherwise from
+    `changed()` calls on the booking write path, relayed between workers
+    through pub/sub.
+    """
+
+    def __init__(self, db, pubsub: PubSub, interval: float = 1.0):
+        self._db = db
+        self._pubsub = pubsub
+        self._interval = interval
+        self._frames = PubSub()
+        self._listeners = 0
+        self._dirty: Set[ObjectId] = set()
+        self._pending = asyncio.Event()
+        self._use_change_stream = True
+        self._watching = False
+        self._tasks = []
+
+    async def start(self):
+        self._tasks = [
+            asyncio.create_task(self._listen_forever()),
+            asyncio.create_task(self._flush_forever())
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def changed(self, class_id: ObjectId):
+        """Called by the booking write path after seats_taken changed"""
+        if not self._watching:
+            await self._pubsub.publish(CHANNEL, str(class_id))
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[asyncio.Queue]:
+        """Queue of frames, each a list of {id, seats_taken, seats_available}"""
+        self._listeners += 1
+        try:
+            async with self._frames.subscribe(CHANNEL) as queue:
+                yield queue
+        finally:
+            self._listeners -= 1
+
+    def _mark(self, class_id: ObjectId):
+        self._dirty.add(class_id)
+        self._pending.set()
+
+    async def _listen_forever(self):
+        while True:
+            try:
+                if self._use_change_stream:
+                    await self._watch()
+                else:
+                    await self._relay()
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    logger.info("Change streams unavailable, relaying seat changes through pub/sub")
+                    self._use_change_stream = False
+                    continue
+                logger.error(f"Seat feed listener error: {e!r}")
+            except Exception as e:
+                logger.error(f"Seat feed listener error: {e!r}")
+            finally:
+                self._watching = False
+            await asyncio.sleep(1)
+
+    async def _watch(self):
+        pipeline = [{"$match": {
+            "operationType": "update",
+            "updateDescription.updatedFields.seats_taken": {"$exists": True}
+        }}]
+        async with self._db.live_classes.watch(pipeline) as stream:
+            self._watching = True
+            async for change in stream:
+                self._mark(change['documentKey']['_id'])
+
+    async def _relay(self):
+        async with self._pubsub.subscribe(CHANNEL, maxsize=1024) as queue:
+            while True:
+                self._mark(ObjectId(await queue.get()))
+
+    async def _flush_forever(self):
+        while True:
+            await self._pending.wait()
+            # Let the rest of the burst accumulate
+            await asyncio.sleep(self._interval)
+            self._pending.clear()
+            dirty, self._dirty = self._dirty, set()
+            if not self._listeners:
+                continue
+
+            try:
+                live_classes = await self._db.live_classes.find(
+                    {"_id": {"$in": list(dirty)}}, {"seats_taken": 1, "max_participants": 1}
+                ).to_list(None)
+            except Exception as e:
+                logger.error(f"Seat feed flush failed: {e!r}")
+                continue
+
+            frame = [
+                {
+                    "id": str(lc['_id']),
+                    "seats_taken": lc.get('seats_taken', 0),
+                    "seats_available": max(lc['max_participants'] - lc.get('seats_taken', 0), 0)
+                }
+                for lc in live_classes
+            ]
+            if frame:
+                await self._frames.publish(CHANNEL, frame)
@@ -0,0 +1,40 @@
+from typing import Any, Optional
+
+import orjson
+from bson import ObjectId
+from starlette.responses import JSONResponse, Response
+
+
+def _default(obj: Any) -> Any:
+    # orjson handles datetime, UUID and dataclasses natively; only BSON types are left
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any, sort_keys: bool = False) -> bytes:
+    """Encode to JSON bytes in a single pass, with ObjectId rendered as its hex string"""
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return orjson.dumps(content, default=_default, option=option)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson; the app's default response class"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(content: Any, response: Optional[Response] = None) -> Response:
+    """Return from an endpoint to skip FastAPI's jsonable_encoder pass.
+
+    `content` may be pre-rendered JSON bytes (e.g. from a cache). Headers set
+    on the injected `response` are carried over, since FastAPI only applies
+    them to responses it builds itself.
+    """
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    if isinstance(content, bytes):
+        return Response(content, media_type="application/json", headers=headers)
+    return ORJSONResponse(content, headers=headers)
@@ -1,18 +1,41 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, Header
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, Response, Header, Query, WebSocket
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 import os
+import asyncio
+import json
 import logging
 import random
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional, Dict, Any, Tuple, Callable, Awaitable
+from datetime import datetime, timedelta, timezone
 from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
 from policies import policy_router
+from catalog_cache import CatalogCache
+from indexes import INDEXES, ensure_indexes
+from lesson_index import INDEX_VERSION, build_lesson_index
+from enrollment import EnrollmentService, migrate_enrollments
+from live_classes import BOOKED, WAITLISTED, BookingError, LiveClassBookings, migrate_live_class_bookings
+from stats import StatsRollup
+from analytics import GRANULARITIES, Analytics
+from otp_store import MemoryOTPStore, MongoOTPStore
+from sms import CircuitBreaker, SMSDispatcher
+from auth_tokens import InvalidTokenError, SessionTokens
+from payment_gateway import LocalGateway, PaymentGatewayError, RazorpayGateway
+from pubsub import MongoPubSubBackend, PubSub
+from seat_feed import SeatAvailabilityFeed
+from http_cache import conditional, make_etag
+from serialization import ORJSONResponse, dumps, json_response
+from renderers import RENDERERS, Renderer, negotiate, render_response, rendered_response
+from compression import CompressionMiddleware
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -24,26 +47,115 @@ db = client[os.environ['DB_NAME']]
 
 # Stripe setup
 STRIPE_API_KEY = os.environ['STRIPE_API_KEY']
+stripe_client = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url="")
+
+# Pending sessions are checked with Stripe only if the webhook is late, and
+# concurrent polls for one session share a single short-lived upstream result
+STRIPE_RECONCILE_AFTER_SECONDS = int(os.environ.get('STRIPE_RECONCILE_AFTER_SECONDS', '10'))
+stripe_status_cache = CatalogCache(
+    maxsize=1024,
+    ttl=float(os.environ.get('STRIPE_STATUS_CACHE_TTL', '5'))
+)
 
 # Razorpay setup
 RAZORPAY_KEY_ID = os.environ['RAZORPAY_KEY_ID']
 RAZORPAY_KEY_SECRET = os.environ['RAZORPAY_KEY_SECRET']
 
-import razorpay
-razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+# PAYMENT_GATEWAY=local swaps Razorpay for an in-process stand-in (benchmarks, local dev)
+if os.environ.get('PAYMENT_GATEWAY', 'razorpay') == 'local':
+    payment_gateway = LocalGateway(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET)
+else:
+    payment_gateway = RazorpayGateway(
+        RAZORPAY_KEY_ID,
+        RAZORPAY_KEY_SECRET,
+        max_workers=int(os.environ.get('RAZORPAY_MAX_WORKERS', '4')),
+        timeout=float(os.environ.get('RAZORPAY_TIMEOUT_SECONDS', '10'))
+    )
 
 # Twilio setup
 TWILIO_ACCOUNT_SID = os.environ['TWILIO_ACCOUNT_SID']
 TWILIO_AUTH_TOKEN = os.environ['TWILIO_AUTH_TOKEN']
 TWILIO_PHONE_NUMBER = os.environ['TWILIO_PHONE_NUMBER']
-twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+SMS_TIMEOUT_SECONDS = float(os.environ.get('SMS_TIMEOUT_SECONDS', '10'))
+twilio_client = Client(
+    TWILIO_ACCOUNT_SID,
+    TWILIO_AUTH_TOKEN,
+    http_client=TwilioHttpClient(timeout=SMS_TIMEOUT_SECONDS)
+)
+
+def send_sms(to: str, body: str):
+    """Blocking Twilio call; only run through sms_dispatcher"""
+    return twilio_client.messages.create(body=body, from_=TWILIO_PHONE_NUMBER, to=to)
+
+# SMS is delivered in the background so Twilio latency never blocks the event loop
+sms_dispatcher = SMSDispatcher(
+    send_sms,
+    max_workers=int(os.environ.get('SMS_MAX_WORKERS', '4')),
+    max_pending=int(os.environ.get('SMS_MAX_PENDING', '200')),
+    timeout=SMS_TIMEOUT_SECONDS,
+    breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30)
+)
+
+# Signed session tokens
+session_tokens = SessionTokens(
+    os.environ['SESSION_SECRET'],
+    ttl=int(os.environ.get('SESSION_TTL_SECONDS', str(7 * 24 * 3600)))
+)
+
+# Admin dashboard totals, maintained by the write paths below
+stats_rollup = StatsRollup(db)
+STATS_RECONCILE_SECONDS = float(os.environ.get('STATS_RECONCILE_SECONDS', '3600'))
+
+# Time-bucketed admin analytics, updated on write
+analytics = Analytics(db)
+
+# Every payment path enrolls through this service
+enrollment_service = EnrollmentService(client, db, stats_rollup, analytics)
+
+# Live class seats and waitlists, stored in live_class_bookings
+live_bookings = LiveClassBookings(db)
+
+# Payment outcome fan-out; PUBSUB_BACKEND=mongo relays events between workers
+pubsub = PubSub(MongoPubSubBackend(db) if os.environ.get('PUBSUB_BACKEND') == 'mongo' else None)
+PAYMENT_STREAM_TIMEOUT_SECONDS = int(os.environ.get('PAYMENT_STREAM_TIMEOUT_SECONDS', '60'))
+# Payment sockets also re-read payment state this often, in case no event reaches this worker
+PAYMENT_STREAM_POLL_SECONDS = float(os.environ.get('PAYMENT_STREAM_POLL_SECONDS', '3'))
+
+# Live class seat counts streamed over SSE, at most one frame per coalescing window
+seat_feed = SeatAvailabilityFeed(db, pubsub, interval=float(os.environ.get('SEAT_STREAM_COALESCE_SECONDS', '1')))
+SEAT_STREAM_KEEPALIVE_SECONDS = 15
 
 # Admin credentials (in production, use proper authentication)
 ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME', 'admin@nnacademy.com')
 ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'Admin@123')
 
+# Course catalog cache (invalidated by admin course writes)
+CATALOG_CACHE_SIZE = int(os.environ.get('CATALOG_CACHE_SIZE', '256'))
+CATALOG_CACHE_TTL = float(os.environ.get('CATALOG_CACHE_TTL', '300'))
+catalog_cache = CatalogCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+
+# Rendered bodies and ETags of catalog entries, one per media type, kept apart
+# so they do not push the data entries out of the LRU
+rendered_cache = CatalogCache(
+    maxsize=CATALOG_CACHE_SIZE * len({renderer.media_type for renderer in RENDERERS.values()}),
+    ttl=CATALOG_CACHE_TTL
+)
+
+def clear_catalog_cache():
+    """Drop cached catalog data and every rendering of it"""
+    catalog_cache.clear()
+    rendered_cache.clear()
+
+# Certificates never change once issued, so their bodies and ETags are kept longer
+certificate_cache = CatalogCache(maxsize=1024, ttl=3600)
+
+# Cache-Control per route; clients revalidate with If-None-Match after max-age
+COURSES_CACHE_CONTROL = "public, max-age=60"
+COURSE_CACHE_CONTROL = "public, max-age=300"
+CERTIFICATE_CACHE_CONTROL = "public, max-age=86400"
+
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -95,7 +207,7 @@ class LiveClass(BaseModel):
     date_time: datetime
     instructor: str
     max_participants: int
-    enrolled_users: List[str] = []
+    seats_taken: int = 0  # Confirmed bookings in live_class_bookings
     thumbnail: str
     duration: int  # in minutes
 
@@ -128,8 +240,25 @@ class RazorpayOrderRequest(BaseModel):
 class ProgressUpdate(BaseModel):
     lesson_id: str
 
+class ProgressEvent(BaseModel):
+    course_id: str
+    lesson_id: str
+    completed_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    @field_validator('completed_at')
+    @classmethod
+    def naive_utc(cls, value: datetime) -> datetime:
+        """Store naive UTC like the rest of the app, whatever offset the client sent"""
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+class ProgressBatch(BaseModel):
+    events: List[ProgressEvent] = Field(..., max_length=500)
+
 class LiveClassBooking(BaseModel):
     class_id: str
+    join_waitlist: bool = False  # Queue for a seat instead of failing when full
 
 class Certificate(BaseModel):
     id: Optional[str] = None
@@ -182,62 +311,172 @@ def serialize_doc(doc):
         del doc['_id']
     return doc
 
-# Generate mock OTP (in production, use Twilio or similar)
-OTP_STORAGE = {}
+# Fields needed to render a course card in list views (no syllabus tree)
+COURSE_CARD_PROJECTION = {
+    "title": 1,
+    "description": 1,
+    "price": 1,
+    "price_inr": 1,
+    "thumbnail": 1,
+    "category": 1,
+    "instructor": 1,
+    "duration": 1,
+    "students_count": 1,
+    "course_type": 1,
+    "external_url": 1,
+    "certificate_enabled": 1
+}
+
+# Fields a client may request through the `fields` query parameter
+COURSE_FIELDS = set(COURSE_CARD_PROJECTION) | {"lessons"}
+
+def parse_course_fields(fields: Optional[str]):
+    """Map a comma separated `fields` parameter to a Mongo projection"""
+    if not fields:
+        return COURSE_CARD_PROJECTION
+    
+    requested = [f.strip() for f in fields.split(',') if f.strip() and f.strip() != 'id']
+    unknown = [f for f in requested if f not in COURSE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown course fields: {', '.join(unknown)}")
+    
+    # An empty inclusion projection would return every field, so fall back to ids only
+    return {f: 1 for f in requested} or {"_id": 1}
+
+def lesson_fields(lessons: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Course fields derived from the syllabus, computed whenever lessons are written"""
+    lessons, index = build_lesson_index(lessons)
+    return {"lessons": lessons, "lesson_index": index, "lesson_count": index['count']}
+
+def course_lesson_index(course: Dict[str, Any]) -> Dict[str, Any]:
+    """Precomputed lesson index, built on the fly for courses written before it existed"""
+    return course.get('lesson_index') or build_lesson_index(course.get('lessons', []))[1]
+
+def progress_update_pipeline(lesson_ids: List[str], course_lesson_ids: List[str]) -> List[Dict[str, Any]]:
+    """Update pipeline that adds lesson ids to completed_lessons and recomputes progress.
+    
+    Only completed lessons that belong to the course count towards progress.
+    """
+    existing = {"$ifNull": ["$completed_lessons", []]}
+    # Pipeline equivalent of $addToSet/$each that keeps completion order
+    completed = {
+        "$concatArrays": [
+            existing,
+            {
+                "$filter": {
+                    "input": {"$literal": list(dict.fromkeys(lesson_ids))},
+                    "as": "lesson_id",
+                    "cond": {"$not": [{"$in": ["$$lesson_id", existing]}]}
+                }
+            }
+        ]
+    }
+    
+    progress = 0
+    if course_lesson_ids:
+        counted = {"$size": {"$setIntersection": ["$completed_lessons", {"$literal": course_lesson_ids}]}}
+        progress = {"$multiply": [{"$divide": [counted, len(course_lesson_ids)]}, 100]}
+    
+    return [
+        {"$set": {"completed_lessons": completed}},
+        {"$set": {"progress": progress}}
+    ]
+
+def payment_channel(payment_id: str) -> str:
+    """Pub/sub channel carrying the outcome of one checkout"""
+    return f"payment:{payment_id}"
+
+def to_object_ids(ids):
+    """Convert string ids to ObjectIds, skipping any that are malformed"""
+    object_ids = []
+    for value in ids:
+        if ObjectId.is_valid(value):
+            object_ids.append(ObjectId(value))
+    return object_ids
+
+# OTP storage: "mongo" is shared across workers, "memory" is per process
+OTP_TTL_SECONDS = int(os.environ.get('OTP_TTL_SECONDS', '600'))
+
+if os.environ.get('OTP_STORE', 'mongo') == 'memory':
+    otp_store = MemoryOTPStore(
+        ttl=OTP_TTL_SECONDS,
+        maxsize=int(os.environ.get('OTP_STORE_MAXSIZE', '10000'))
+    )
+else:
+    otp_store = MongoOTPStore(db.otp_codes, ttl=OTP_TTL_SECONDS)
 
 def generate_otp():
     return str(random.randint(100000, 999999))
 
+def get_session(authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
+    """Verify the bearer session token without touching the database"""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    token = authorization.replace("Bearer ", "")
+    try:
+        return session_tokens.verify(token)
+    except InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid or expired session")
+
+def get_user_id(session: Dict[str, Any] = Depends(get_session)) -> str:
+    """User id of the authenticated caller"""
+    return session['sub']
+
+def get_optional_user_id(authorization: Optional[str] = Header(None)) -> Optional[str]:
+    """User id of the caller if a valid session token was sent, None otherwise.
+    
+    For public endpoints: a stale or invalid token gets the anonymous view
+    rather than a 401, which would make the app drop its stored session.
+    """
+    if not authorization:
+        return None
+    try:
+        return session_tokens.verify(authorization.replace("Bearer ", ""))['sub']
+    except InvalidTokenError:
+        return None
+
 # ============= Authentication APIs =============
 
 @api_router.post("/auth/send-otp")
 async def send_otp(request: PhoneRequest):
     """Send OTP to phone number via Twilio SMS"""
     otp = generate_otp()
-    OTP_STORAGE[request.phone] = otp
+    await otp_store.put(request.phone, otp)
     
     # Format phone number for Twilio (add +91 prefix for Indian numbers)
     phone_number = request.phone
     if not phone_number.startswith('+'):
         phone_number = f"+91{phone_number}"
     
-    try:
-        # Send SMS via Twilio
-        message = twilio_client.messages.create(
-            body=f"Your N&N Makeup Academy OTP is: {otp}. Valid for 10 minutes.",
-            from_=TWILIO_PHONE_NUMBER,
-            to=phone_number
-        )
-        
-        logging.info(f"SMS sent to {phone_number}. Message SID: {message.sid}")
-        logging.info(f"OTP for {request.phone}: {otp}")
-        
+    queued = sms_dispatcher.dispatch(
+        phone_number,
+        f"Your N&N Makeup Academy OTP is: {otp}. Valid for {OTP_TTL_SECONDS // 60} minutes."
+    )
+    logging.info(f"OTP for {request.phone}: {otp}")
+    
+    if queued:
         return {
             "success": True,
             "message": "OTP sent successfully to your phone",
             "otp": otp  # Keep this for development/testing
         }
-    except Exception as e:
-        logging.error(f"Failed to send SMS to {phone_number}: {str(e)}")
-        # Still return success but with warning
-        return {
-            "success": True,
-            "message": "OTP generated (SMS service unavailable)",
-            "otp": otp,
-            "warning": "Please use the OTP shown on screen"
-        }
+    
+    # Still return success but with warning
+    return {
+        "success": True,
+        "message": "OTP generated (SMS service unavailable)",
+        "otp": otp,
+        "warning": "Please use the OTP shown on screen"
+    }
 
 @api_router.post("/auth/verify-otp")
 async def verify_otp(request: OTPVerifyRequest):
     """Verify OTP and create/login user"""
-    stored_otp = OTP_STORAGE.get(request.phone)
-    
-    if not stored_otp or stored_otp != request.otp:
+    # Consume the OTP so it cannot be reused
+    if not await otp_store.consume(request.phone, request.otp):
         raise HTTPException(status_code=400, detail="Invalid OTP")
     
-    # Remove used OTP
-    del OTP_STORAGE[request.phone]
-    
     # Check if user exists
     user = await db.users.find_one({"phone": request.phone})
     
@@ -253,41 +492,44 @@ async def verify_otp(request: OTPVerifyRequest):
         result = await db.users.insert_one(new_user)
         new_user['_id'] = result.inserted_id
         user = new_user
+        await stats_rollup.increment(total_users=1)
     
     user = serialize_doc(user)
     
-    return {
+    return json_response({
         "success": True,
         "message": "Login successful",
         "user": user,
-        "token": user['id']  # Simple token (use JWT in production)
-    }
+        "token": session_tokens.issue(user['id'], user.get('enrolled_courses', []))
+    })
+
+@api_router.post("/auth/refresh")
+async def refresh_session(user_id: str = Depends(get_user_id)):
+    """Re-issue the session token with a fresh expiry and enrolled course set"""
+    user = await db.users.find_one({"_id": ObjectId(user_id)}, {"enrolled_courses": 1})
+    
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    return {"token": session_tokens.issue(user_id, user.get('enrolled_courses', []))}
 
 @api_router.get("/auth/me")
-async def get_current_user(authorization: Optional[str] = Header(None)):
+async def get_current_user(user_id: str = Depends(get_user_id)):
     """Get current user details"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    user_id = authorization.replace("Bearer ", "")
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return serialize_doc(user)
+    return json_response(serialize_doc(user))
 
 @api_router.put("/auth/profile")
 async def update_profile(
     name: Optional[str] = None,
     email: Optional[str] = None,
-    authorization: Optional[str] = Header(None)
+    user_id: str = Depends(get_user_id)
 ):
     """Update user profile"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    user_id = authorization.replace("Bearer ", "")
     update_data = {}
     
     if name:
@@ -305,101 +547,212 @@ async def update_profile(
 
 # ============= Course APIs =============
 
+async def get_cached_course(course_id: str):
+    """Full course document read through the catalog cache (None if missing)"""
+    async def load_course():
+        course = await db.courses.find_one({"_id": ObjectId(course_id)})
+        return serialize_doc(course)
+    
+    return await catalog_cache.get_or_load(("course", course_id), load_course)
+
+async def render_cached(cache_key: tuple, load: Callable[[], Awaitable[Tuple[Any, str]]], renderer: Renderer):
+    """Body, ETag and extra of catalog content in one media type, rendered once per cache entry.
+    
+    `load` returns the content and `extra`, a string of response header values
+    that are not part of the body but go into the ETag. It runs inside the
+    rendered entry's own load, so a cache clear racing a cold load drops the
+    rendering along with the data.
+    """
+    async def render():
+        content, extra = await load()
+        body = renderer.render(content)
+        return body, make_etag(body + extra.encode()), extra
+    
+    return await rendered_cache.get_or_load((renderer.media_type,) + cache_key, render)
+
 @api_router.get("/courses")
-async def get_courses(category: Optional[str] = None):
-    """Get all courses or filter by category"""
+async def get_courses(
+    request: Request,
+    response: Response,
+    category: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=100),
+    fields: Optional[str] = None
+):
+    """Get courses as course cards, paginated by id and optionally filtered by category.
+    
+    Pass the `X-Next-Cursor` response header back as `after` to fetch the next page.
+    """
     query = {}
     if category:
         query['category'] = category
+    if after:
+        if not ObjectId.is_valid(after):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query['_id'] = {"$gt": ObjectId(after)}
+    
+    projection = parse_course_fields(fields)
+    
+    async def load_courses():
+        # Fetch one extra document to know whether another page exists
+        courses = await db.courses.find(query, projection).sort("_id", 1).limit(limit + 1).to_list(limit + 1)
+        next_cursor = str(courses[limit - 1]['_id']) if len(courses) > limit else None
+        return [serialize_doc(course) for course in courses[:limit]], next_cursor
+    
+    cache_key = ("courses", category, after, limit, tuple(sorted(projection)))
+    
+    async def load_page():
+        courses, next_cursor = await catalog_cache.get_or_load(cache_key, load_courses)
+        return courses, next_cursor or ""
+    
+    # Rendered once per cache entry and media type; hits send the cached bytes as they are
+    renderer = negotiate(request)
+    body, etag, next_cursor = await render_cached(cache_key, load_page, renderer)
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    response.headers["Vary"] = "Accept"
     
-    courses = await db.courses.find(query).to_list(100)
-    return [serialize_doc(course) for course in courses]
+    return conditional(request, response, etag, COURSES_CACHE_CONTROL) or rendered_response(body, renderer, response)
 
 @api_router.get("/courses/{course_id}")
-async def get_course(course_id: str):
+async def get_course(course_id: str, request: Request, response: Response):
     """Get course details"""
-    course = await db.courses.find_one({"_id": ObjectId(course_id)})
+    course = await get_cached_course(course_id)
     
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    return serialize_doc(course)
+    async def load_course():
+        return await get_cached_course(course_id), ""
+    
+    renderer = negotiate(request)
+    body, etag, _ = await render_cached(("course", course_id), load_course, renderer)
+    response.headers["Vary"] = "Accept"
+    
+    return conditional(request, response, etag, COURSE_CACHE_CONTROL) or rendered_response(body, renderer, response)
 
 @api_router.get("/my-courses")
-async def get_my_courses(authorization: Optional[str] = Header(None)):
+async def get_my_courses(request: Request, user_id: str = Depends(get_user_id)):
     """Get user's enrolled courses"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    user_id = authorization.replace("Bearer ", "")
-    
     # Get enrollments
-    enrollments = await db.enrollments.find({"user_id": user_id}).to_list(100)
-    
-    # Get course details
+    enrollments = await db.enrollments.find(
+        {"user_id": user_id},
+        {"course_id": 1, "progress": 1}
+    ).to_list(100)
+    
+    # Fetch all enrolled courses in a single round trip
+    course_ids = to_object_ids(e['course_id'] for e in enrollments)
+    courses = await db.courses.find(
+        {"_id": {"$in": course_ids}},
+        COURSE_CARD_PROJECTION
+    ).to_list(100)
+    courses_by_id = {str(course['_id']): course for course in courses}
+    
+    # Keep enrollment order when merging course details
     result = []
     for enrollment in enrollments:
-        course = await db.courses.find_one({"_id": ObjectId(enrollment['course_id'])})
+        course = courses_by_id.get(enrollment['course_id'])
         if course:
-            course = serialize_doc(course)
+            course = serialize_doc(dict(course))
             course['progress'] = enrollment.get('progress', 0.0)
             course['enrollment_id'] = str(enrollment['_id'])
             result.append(course)
     
-    return result
+    return render_response(request, result)
 
 @api_router.post("/courses/{course_id}/progress")
 async def update_progress(
     course_id: str,
     request: ProgressUpdate,
-    authorization: Optional[str] = Header(None)
+    user_id: str = Depends(get_user_id)
 ):
     """Update lesson progress"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Not authenticated")
+    course = await get_cached_course(course_id)
+    if not course:
+        return {"success": False}
     
-    user_id = authorization.replace("Bearer ", "")
+    lesson_index = course_lesson_index(course)
     
-    # Find enrollment
-    enrollment = await db.enrollments.find_one({
-        "user_id": user_id,
-        "course_id": course_id
-    })
+    # Add the lesson and recompute progress atomically in one round trip
+    enrollment = await db.enrollments.find_one_and_update(
+        {"user_id": user_id, "course_id": course_id},
+        progress_update_pipeline([request.lesson_id], lesson_index['lesson_ids']),
+        projection={"progress": 1},
+        return_document=ReturnDocument.AFTER
+    )
     
     if not enrollment:
         raise HTTPException(status_code=404, detail="Enrollment not found")
     
-    # Add lesson to completed if not already there
-    completed_lessons = enrollment.get('completed_lessons', [])
-    if request.lesson_id not in completed_lessons:
-        completed_lessons.append(request.lesson_id)
+    progress = enrollment['progress']
     
-    # Calculate progress
-    course = await db.courses.find_one({"_id": ObjectId(course_id)})
-    if course:
-        total_lessons = len(course.get('lessons', []))
-        progress = (len(completed_lessons) / total_lessons * 100) if total_lessons > 0 else 0
-        
-        await db.enrollments.update_one(
-            {"_id": enrollment['_id']},
-            {
-                "$set": {
-                    "completed_lessons": completed_lessons,
-                    "progress": progress
-                }
-            }
-        )
-        
-        # Check if course is completed and generate certificate
-        if progress >= 100 and course.get('certificate_enabled', True):
-            await generate_certificate(user_id, course_id, course)
+    # Check if course is completed and generate certificate
+    if progress >= 100:
+        await complete_course(user_id, course_id, course)
+    
+    return {"success": True, "progress": progress}
+
+@api_router.post("/progress/batch")
+async def sync_progress(request: ProgressBatch, user_id: str = Depends(get_user_id)):
+    """Apply lesson completions recorded offline, across any number of courses"""
+    events_by_course: Dict[str, List[ProgressEvent]] = {}
+    for event in request.events:
+        events_by_course.setdefault(event.course_id, []).append(event)
+    
+    course_ids = [c for c in events_by_course if ObjectId.is_valid(c)]
+    courses = await asyncio.gather(*(get_cached_course(c) for c in course_ids))
+    courses_by_id = {c: course for c, course in zip(course_ids, courses) if course}
+    
+    operations = []
+    for course_id, course in courses_by_id.items():
+        events = events_by_course[course_id]
+        lesson_index = course_lesson_index(course)
+        pipeline = progress_update_pipeline([e.lesson_id for e in events], lesson_index['lesson_ids'])
+        pipeline.append({
+            "$set": {"last_completed_at": {"$max": ["$last_completed_at", max(e.completed_at for e in events)]}}
+        })
+        operations.append(UpdateOne({"user_id": user_id, "course_id": course_id}, pipeline))
+    
+    if operations:
+        await db.enrollments.bulk_write(operations, ordered=False)
+    
+    # Read back the recomputed progress for every touched enrollment at once
+    enrollments = await db.enrollments.find(
+        {"user_id": user_id, "course_id": {"$in": list(courses_by_id)}},
+        {"course_id": 1, "progress": 1}
+    ).to_list(len(courses_by_id) or 1)
+    
+    # Certificate checks run at most once per course
+    progress_by_course = {e['course_id']: e.get('progress', 0) for e in enrollments}
+    
+    results = []
+    for course_id, progress in progress_by_course.items():
+        if progress >= 100:
+            await complete_course(user_id, course_id, courses_by_id[course_id])
         
-        return {"success": True, "progress": progress}
+        results.append({"course_id": course_id, "progress": progress})
     
-    return {"success": False}
+    return json_response({
+        "success": True,
+        "courses": results,
+        "skipped": [c for c in events_by_course if c not in progress_by_course]
+    })
 
 # ============= Certificate APIs =============
 
+async def complete_course(user_id: str, course_id: str, course: dict):
+    """Record the first completion of a course and issue its certificate"""
+    result = await db.enrollments.update_one(
+        {"user_id": user_id, "course_id": course_id, "completed_at": {"$exists": False}},
+        {"$set": {"completed_at": datetime.utcnow()}}
+    )
+    if result.modified_count:
+        await analytics.record(course_id, completions=1)
+    
+    if course.get('certificate_enabled', True):
+        await generate_certificate(user_id, course_id, course)
+
 async def generate_certificate(user_id: str, course_id: str, course: dict):
     """Generate certificate for course completion"""
     # Check if certificate already exists
@@ -431,42 +784,41 @@ async def generate_certificate(user_id: str, course_id: str, course: dict):
         "issued_date": datetime.utcnow()
     }
     
-    await db.certificates.insert_one(certificate)
+    try:
+        await db.certificates.insert_one(certificate)
+    except DuplicateKeyError:
+        return  # A concurrent request issued it first
+    
+    await analytics.record(course_id, certificates=1)
 
 @api_router.get("/my-certificates")
-async def get_my_certificates(authorization: Optional[str] = Header(None)):
+async def get_my_certificates(user_id: str = Depends(get_user_id)):
     """Get user's certificates"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    user_id = authorization.replace("Bearer ", "")
-    
     certificates = []
     async for cert in db.certificates.find({"user_id": user_id}):
         certificates.append(serialize_doc(cert))
     
-    return certificates
+    return json_response(certificates)
 
 @api_router.get("/certificate/{certificate_id}")
-async def get_certificate(certificate_id: str):
+async def get_certificate(certificate_id: str, request: Request, response: Response):
     """Get certificate by ID"""
-    certificate = await db.certificates.find_one({"certificate_id": certificate_id})
+    async def load_certificate():
+        certificate = await db.certificates.find_one({"certificate_id": certificate_id})
+        if not certificate:
+            # Raised inside the loader so misses are not cached
+            raise HTTPException(status_code=404, detail="Certificate not found")
+        body = dumps(serialize_doc(certificate))
+        return body, make_etag(body)
     
-    if not certificate:
-        raise HTTPException(status_code=404, detail="Certificate not found")
-    
-    return serialize_doc(certificate)
+    body, etag = await certificate_cache.get_or_load(certificate_id, load_certificate)
+    return conditional(request, response, etag, CERTIFICATE_CACHE_CONTROL) or json_response(body, response)
 
 # ============= Payment APIs =============
 
 @api_router.post("/payment/create-razorpay-order")
-async def create_razorpay_order(request: RazorpayOrderRequest, authorization: Optional[str] = Header(None)):
+async def create_razorpay_order(request: RazorpayOrderRequest, user_id: str = Depends(get_user_id)):
     """Create Razorpay order for course enrollment"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    user_id = authorization.replace("Bearer ", "")
-    
     # Get course details
     course = await db.courses.find_one({"_id": ObjectId(request.course_id)})
     if not course:
@@ -498,7 +850,7 @@ async def create_razorpay_order(request: RazorpayOrderRequest, authorization: Op
             }
         }
         
-        razorpay_order = razorpay_client.order.create(data=order_data)
+        razorpay_order = await payment_gateway.create_order(order_data)
         
         # Store order in database
         order_record = {
@@ -517,9 +869,11 @@ async def create_razorpay_order(request: RazorpayOrderRequest, authorization: Op
             "order_id": razorpay_order['id'],
             "amount": amount_paise,
             "currency": "INR",
-            "key_id": RAZORPAY_KEY_ID
+            "key_id": payment_gateway.key_id
         }
         
+    except PaymentGatewayError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to create order: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create order: {str(e)}")
 
@@ -528,51 +882,43 @@ async def verify_razorpay_payment(
     order_id: str,
     payment_id: str,
     signature: str,
-    authorization: Optional[str] = Header(None)
+    user_id: str = Depends(get_user_id)
 ):
     """Verify Razorpay payment and enroll user"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    user_id = authorization.replace("Bearer ", "")
-    
     try:
         # Verify payment signature
-        params_dict = {
-            'razorpay_order_id': order_id,
-            'razorpay_payment_id': payment_id,
-            'razorpay_signature': signature
-        }
-        
-        razorpay_client.utility.verify_payment_signature(params_dict)
-        
+        payment_gateway.verify_payment_signature(order_id, payment_id, signature)
+    except PaymentGatewayError as e:
+        # Record the failure only against the caller's own unpaid order
+        result = await db.payment_orders.update_one(
+            {"order_id": order_id, "user_id": user_id, "status": {"$ne": "paid"}},
+            {"$set": {"status": "failed"}}
+        )
+        if result.modified_count:
+            await pubsub.publish(payment_channel(order_id), {"status": "failed"})
+        raise HTTPException(status_code=400, detail=f"Payment verification failed: {str(e)}")
+    
+    try:
         # Get order details
-        order = await db.payment_orders.find_one({"order_id": order_id})
+        order = await db.payment_orders.find_one({"order_id": order_id, "user_id": user_id})
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
         
-        # Update order status
-        await db.payment_orders.update_one(
-            {"order_id": order_id},
-            {"$set": {"status": "paid", "payment_id": payment_id, "paid_at": datetime.utcnow()}}
-        )
-        
-        # Enroll user in course
-        enrollment = {
-            "user_id": user_id,
-            "course_id": order['course_id'],
-            "enrolled_at": datetime.utcnow(),
-            "completed_lessons": [],
-            "progress": 0
-        }
-        
-        await db.enrollments.insert_one(enrollment)
-        
-        # Update user's enrolled courses
-        await db.users.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$addToSet": {"enrolled_courses": order['course_id']}}
-        )
+        # Retries for an order that is already paid are a no-op
+        if order.get('status') != 'paid':
+            await enrollment_service.enroll(
+                user_id,
+                order['course_id'],
+                idempotency_key=f"razorpay:{order_id}",
+                source="razorpay",
+                payment_update=(
+                    "payment_orders",
+                    {"order_id": order_id, "status": {"$ne": "paid"}},
+                    {"$set": {"status": "paid", "payment_id": payment_id, "paid_at": datetime.utcnow()}}
+                ),
+                revenue={"revenue_inr": order.get('amount', 0)}
+            )
+            await pubsub.publish(payment_channel(order_id), {"status": "paid"})
         
         return {"success": True, "message": "Payment verified and enrolled successfully"}
         
@@ -583,14 +929,9 @@ async def verify_razorpay_payment(
 async def create_checkout(
     request: CheckoutRequest,
     http_request: Request,
-    authorization: Optional[str] = Header(None)
+    user_id: str = Depends(get_user_id)
 ):
     """Create Stripe checkout session"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    user_id = authorization.replace("Bearer ", "")
-    
     # Get course details
     course = await db.courses.find_one({"_id": ObjectId(request.course_id)})
     if not course:
@@ -650,146 +991,296 @@ async def create_checkout(
         "session_id": session.session_id
     }
 
-@api_router.get("/payment/status/{session_id}")
-async def get_payment_status(session_id: str, authorization: Optional[str] = Header(None)):
-    """Get payment status and enroll user if successful"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Not authenticated")
+async def fulfill_stripe_session(session_id: str) -> bool:
+    """Mark a Stripe transaction paid and enroll the buyer; safe to call repeatedly"""
+    transaction = await db.payment_transactions.find_one({"session_id": session_id})
+    if not transaction or transaction.get('payment_status') == 'paid':
+        return False
+    
+    await enrollment_service.enroll(
+        transaction['user_id'],
+        transaction['course_id'],
+        idempotency_key=f"stripe:{session_id}",
+        source="stripe",
+        payment_update=(
+            "payment_transactions",
+            {"session_id": session_id, "payment_status": {"$ne": "paid"}},
+            {"$set": {"payment_status": "paid", "status": "complete", "paid_at": datetime.utcnow()}}
+        ),
+        revenue={"revenue_usd": transaction.get('amount', 0)}
+    )
     
-    user_id = authorization.replace("Bearer ", "")
+    await pubsub.publish(payment_channel(session_id), {"status": "paid"})
     
-    # Get transaction
-    transaction = await db.payment_transactions.find_one({"session_id": session_id})
+    return True
+
+@api_router.get("/payment/status/{session_id}")
+async def get_payment_status(session_id: str, user_id: str = Depends(get_user_id)):
+    """Get payment status; enrollment is performed by the Stripe webhook"""
+    transaction = await db.payment_transactions.find_one(
+        {"session_id": session_id},
+        {"payment_status": 1, "status": 1, "created_at": 1}
+    )
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
-    # If already completed, return status
-    if transaction.get('payment_status') == 'paid':
-        return {"status": "success", "message": "Payment already processed"}
-    
-    # Check with Stripe
-    stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url="")
-    checkout_status = await stripe_checkout.get_checkout_status(session_id)
+    status, payment_status = await reconcile_stripe_session(session_id, transaction)
+    if payment_status == 'paid':
+        return {"status": "success", "message": "Payment successful, enrollment created"}
     
-    # Update transaction
-    await db.payment_transactions.update_one(
-        {"session_id": session_id},
-        {
-            "$set": {
-                "payment_status": checkout_status.payment_status,
-                "status": checkout_status.status
-            }
-        }
-    )
+    return {"status": status, "payment_status": payment_status}
+
+async def reconcile_stripe_session(session_id: str, transaction: Dict[str, Any]) -> Tuple[str, str]:
+    """(status, payment_status) of a session, asking Stripe when the webhook has not arrived in time"""
+    status = transaction.get('status', 'open')
+    payment_status = transaction.get('payment_status', 'pending')
     
-    # If payment successful and not already enrolled, create enrollment
-    if checkout_status.payment_status == "paid":
-        existing_enrollment = await db.enrollments.find_one({
-            "user_id": transaction['user_id'],
-            "course_id": transaction['course_id']
-        })
+    created_at = transaction.get('created_at') or datetime.utcnow()
+    webhook_overdue = datetime.utcnow() - created_at > timedelta(seconds=STRIPE_RECONCILE_AFTER_SECONDS)
+    if payment_status == 'pending' and webhook_overdue:
+        checkout_status = await stripe_status_cache.get_or_load(
+            session_id,
+            lambda: stripe_client.get_checkout_status(session_id)
+        )
         
-        if not existing_enrollment:
-            enrollment = {
-                "user_id": transaction['user_id'],
-                "course_id": transaction['course_id'],
-                "progress": 0.0,
-                "completed_lessons": [],
-                "enrolled_at": datetime.utcnow()
-            }
-            await db.enrollments.insert_one(enrollment)
-            
-            # Update course students count
-            await db.courses.update_one(
-                {"_id": ObjectId(transaction['course_id'])},
-                {"$inc": {"students_count": 1}}
-            )
-            
-            # Update user's enrolled courses
-            await db.users.update_one(
-                {"_id": ObjectId(transaction['user_id'])},
-                {"$addToSet": {"enrolled_courses": transaction['course_id']}}
-            )
+        if checkout_status.payment_status == "paid":
+            await fulfill_stripe_session(session_id)
+            return checkout_status.status, 'paid'
         
-        return {"status": "success", "message": "Payment successful, enrollment created"}
+        if (checkout_status.status, checkout_status.payment_status) != (status, payment_status):
+            status, payment_status = checkout_status.status, checkout_status.payment_status
+            await db.payment_transactions.update_one(
+                {"session_id": session_id, "payment_status": {"$ne": "paid"}},
+                {"$set": {"payment_status": payment_status, "status": status}}
+            )
     
-    return {"status": checkout_status.status, "payment_status": checkout_status.payment_status}
+    return status, payment_status
 
 @api_router.post("/webhook/stripe")
 async def stripe_webhook(request: Request):
-    """Handle Stripe webhooks"""
+    """Handle Stripe webhooks: verify, deduplicate and fulfil checkout sessions"""
     try:
         body = await request.body()
         signature = request.headers.get("Stripe-Signature")
         
-        stripe_checkout = StripeCheckout(api_key=STRIPE_API_KEY, webhook_url="")
-        webhook_response = await stripe_checkout.handle_webhook(body, signature)
-        
-        logging.info(f"Webhook received: {webhook_response.event_type}")
-        
-        return {"status": "success"}
+        webhook_response = await stripe_client.handle_webhook(body, signature)
     except Exception as e:
         logging.error(f"Webhook error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
+    
+    logging.info(f"Webhook received: {webhook_response.event_type} ({webhook_response.event_id})")
+    
+    # Stripe delivers at least once; the event id is the deduplication key
+    try:
+        await db.stripe_events.insert_one({
+            "_id": webhook_response.event_id,
+            "event_type": webhook_response.event_type,
+            "session_id": webhook_response.session_id,
+            "received_at": datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        return {"status": "success", "duplicate": True}
+    
+    try:
+        if webhook_response.payment_status == "paid":
+            await fulfill_stripe_session(webhook_response.session_id)
+        elif webhook_response.event_type == "checkout.session.expired":
+            result = await db.payment_transactions.update_one(
+                {"session_id": webhook_response.session_id, "payment_status": {"$ne": "paid"}},
+                {"$set": {"payment_status": "expired", "status": "expired"}}
+            )
+            if result.modified_count:
+                await pubsub.publish(payment_channel(webhook_response.session_id), {"status": "failed"})
+    except Exception as e:
+        # Forget the event so Stripe's retry is processed again
+        await db.stripe_events.delete_one({"_id": webhook_response.event_id})
+        logging.error(f"Webhook processing failed for {webhook_response.event_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Webhook processing failed")
+    
+    return {"status": "success"}
+
+async def payment_outcome(payment_id: str, user_id: str, reconcile: bool = False) -> Optional[str]:
+    """'paid', 'failed' or 'pending' for the caller's Stripe session or Razorpay order.
+    
+    With `reconcile`, a pending Stripe session whose webhook is overdue is checked with Stripe.
+    """
+    transaction = await db.payment_transactions.find_one(
+        {"session_id": payment_id, "user_id": user_id},
+        {"payment_status": 1, "status": 1, "created_at": 1}
+    )
+    if transaction:
+        status, payment_status = transaction.get('status'), transaction.get('payment_status')
+        if reconcile and payment_status != 'paid':
+            status, payment_status = await reconcile_stripe_session(payment_id, transaction)
+        if payment_status == 'paid':
+            return 'paid'
+        if status == 'expired' or payment_status == 'expired':
+            return 'failed'
+        return 'pending'
+    
+    order = await db.payment_orders.find_one({"order_id": payment_id, "user_id": user_id}, {"status": 1})
+    if order:
+        if order.get('status') in ('paid', 'failed'):
+            return order['status']
+        return 'pending'
+    
+    return None
+
+@api_router.websocket("/ws/payments/{payment_id}")
+async def payment_updates(websocket: WebSocket, payment_id: str, token: str = ""):
+    """Push the outcome of a checkout (Stripe session id or Razorpay order id) once it is known.
+    
+    WebSockets cannot carry the Authorization header from the app, so the
+    session token is passed as the `token` query parameter.
+    """
+    try:
+        user_id = session_tokens.verify(token)['sub']
+    except InvalidTokenError:
+        await websocket.close(code=4401)
+        return
+    
+    # Subscribe before reading state so an outcome published in between is not missed
+    async with pubsub.subscribe(payment_channel(payment_id)) as queue:
+        status = await payment_outcome(payment_id, user_id)
+        if status is None:
+            await websocket.close(code=4404)
+            return
+        
+        await websocket.accept()
+        
+        outcome = asyncio.ensure_future(queue.get())
+        client_message = asyncio.ensure_future(websocket.receive())
+        try:
+            deadline = asyncio.get_running_loop().time() + PAYMENT_STREAM_TIMEOUT_SECONDS
+            while status == 'pending':
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                done, _ = await asyncio.wait(
+                    {outcome, client_message},
+                    timeout=min(remaining, PAYMENT_STREAM_POLL_SECONDS),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if outcome in done:
+                    status = outcome.result()['status']
+                elif client_message in done:
+                    if client_message.result()['type'] == 'websocket.disconnect':
+                        return
+                    # Ignore anything else the client sends
+                    client_message = asyncio.ensure_future(websocket.receive())
+                else:
+                    # The event may have been published on another worker, or the
+                    # webhook is late or lost: re-read state (and ask Stripe if overdue)
+                    try:
+                        status = await payment_outcome(payment_id, user_id, reconcile=True)
+                    except Exception as e:
+                        logger.error(f"Payment status check failed for {payment_id}: {e!r}")
+            
+            await websocket.send_json({"payment_id": payment_id, "status": status})
+            await websocket.close()
+        finally:
+            outcome.cancel()
+            client_message.cancel()
 
 # ============= Live Classes APIs =============
 
 @api_router.get("/live-classes")
-async def get_live_classes():
-    """Get all upcoming live classes"""
+async def get_live_classes(request: Request, user_id: Optional[str] = Depends(get_optional_user_id)):
+    """Get all upcoming live classes with seat counts and the caller's booking status"""
     current_time = datetime.utcnow()
     live_classes = await db.live_classes.find({
         "date_time": {"$gte": current_time}
     }).sort("date_time", 1).to_list(100)
     
-    return [serialize_doc(lc) for lc in live_classes]
+    return render_response(request, await live_class_summaries(live_classes, user_id))
 
 @api_router.post("/live-classes/book")
 async def book_live_class(
     request: LiveClassBooking,
-    authorization: Optional[str] = Header(None)
+    user_id: str = Depends(get_user_id)
 ):
-    """Book a live class"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    user_id = authorization.replace("Bearer ", "")
-    
-    # Get live class
-    live_class = await db.live_classes.find_one({"_id": ObjectId(request.class_id)})
-    if not live_class:
-        raise HTTPException(status_code=404, detail="Live class not found")
-    
-    # Check if already booked
-    enrolled_users = live_class.get('enrolled_users', [])
-    if user_id in enrolled_users:
-        raise HTTPException(status_code=400, detail="Already booked this class")
-    
-    # Check capacity
-    if len(enrolled_users) >= live_class['max_participants']:
-        raise HTTPException(status_code=400, detail="Class is full")
-    
-    # Add user to enrolled users
-    await db.live_classes.update_one(
-        {"_id": ObjectId(request.class_id)},
-        {"$addToSet": {"enrolled_users": user_id}}
-    )
+    """Book a live class, or join its waitlist when full"""
+    try:
+        outcome = await live_bookings.book(ObjectId(request.class_id), user_id, request.join_waitlist)
+    except BookingError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    await seat_feed.changed(ObjectId(request.class_id))
     
+    if outcome['status'] == WAITLISTED:
+        return {
+            "success": True,
+            "waitlisted": True,
+            "position": outcome['position'],
+            "message": "Class is full, you have been added to the waitlist"
+        }
     return {"success": True, "message": "Class booked successfully"}
 
+@api_router.post("/live-classes/cancel")
+async def cancel_live_class(
+    request: LiveClassBooking,
+    user_id: str = Depends(get_user_id)
+):
+    """Cancel a booking (or leave the waitlist); frees the seat for the next waitlisted user"""
+    try:
+        status = await live_bookings.cancel(ObjectId(request.class_id), user_id)
+    except BookingError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    await seat_feed.changed(ObjectId(request.class_id))
+    
+    if status == WAITLISTED:
+        return {"success": True, "message": "Removed from waitlist"}
+    return {"success": True, "message": "Booking cancelled"}
+
+@api_router.get("/live-classes/seats/stream")
+async def stream_live_class_seats():
+    """Server-sent events carrying coalesced seat counts of classes as they change"""
+    async def events():
+        async with seat_feed.subscribe() as queue:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), SEAT_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: seats\ndata: {json.dumps(frame)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def live_class_summaries(live_classes: List[Dict[str, Any]], user_id: Optional[str]) -> List[Dict[str, Any]]:
+    """Serialize live classes with counts only, never the attendee list"""
+    class_ids = [lc['_id'] for lc in live_classes]
+    waitlist_counts = await live_bookings.waitlist_counts(class_ids)
+    statuses = await live_bookings.statuses(user_id, class_ids) if user_id else {}
+    
+    summaries = []
+    for lc in live_classes:
+        class_id = lc['_id']
+        status = statuses.get(class_id)
+        summary = serialize_doc(lc)
+        summary.update({
+            "seats_taken": summary.get('seats_taken', 0),
+            "waitlist_count": waitlist_counts.get(class_id, 0),
+            "booked": status == BOOKED,
+            "waitlisted": status == WAITLISTED
+        })
+        summaries.append(summary)
+    return summaries
+
 @api_router.get("/my-live-classes")
-async def get_my_live_classes(authorization: Optional[str] = Header(None)):
+async def get_my_live_classes(user_id: str = Depends(get_user_id)):
     """Get user's booked live classes"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    user_id = authorization.replace("Bearer ", "")
-    
+    class_ids = await live_bookings.booked_class_ids(user_id)
     live_classes = await db.live_classes.find({
-        "enrolled_users": user_id
+        "_id": {"$in": class_ids}
     }).sort("date_time", 1).to_list(100)
     
-    return [serialize_doc(lc) for lc in live_classes]
+    return json_response(await live_class_summaries(live_classes, user_id))
 
 # ============= Admin APIs =============
 
@@ -835,7 +1326,7 @@ async def create_course(
         "instructor": request.instructor,
         "duration": request.duration,
         "students_count": 0,
-        "lessons": request.lessons,
+        **lesson_fields(request.lessons),
         "course_type": request.course_type,
         "external_url": request.external_url,
         "certificate_enabled": request.certificate_enabled
@@ -843,6 +1334,8 @@ async def create_course(
     
     result = await db.courses.insert_one(new_course)
     new_course['_id'] = result.inserted_id
+    clear_catalog_cache()
+    await stats_rollup.increment(total_courses=1)
     
     return {
         "success": True,
@@ -876,12 +1369,13 @@ async def update_course(
     if request.duration is not None:
         update_data['duration'] = request.duration
     if request.lessons is not None:
-        update_data['lessons'] = request.lessons
+        update_data.update(lesson_fields(request.lessons))
     
     await db.courses.update_one(
         {"_id": ObjectId(course_id)},
         {"$set": update_data}
     )
+    clear_catalog_cache()
     
     course = await db.courses.find_one({"_id": ObjectId(course_id)})
     
@@ -900,10 +1394,16 @@ async def delete_course(
     verify_admin(authorization)
     
     # Delete course
-    await db.courses.delete_one({"_id": ObjectId(course_id)})
+    deleted = await db.courses.delete_one({"_id": ObjectId(course_id)})
+    clear_catalog_cache()
     
     # Also delete related enrollments
-    await db.enrollments.delete_many({"course_id": course_id})
+    enrollments = await db.enrollments.delete_many({"course_id": course_id})
+    
+    await stats_rollup.increment(
+        total_courses=-deleted.deleted_count,
+        total_enrollments=-enrollments.deleted_count
+    )
     
     return {
         "success": True,
@@ -915,23 +1415,61 @@ async def get_admin_stats(authorization: Optional[str] = Header(None)):
     """Get admin dashboard statistics"""
     verify_admin(authorization)
     
-    total_courses = await db.courses.count_documents({})
-    total_users = await db.users.count_documents({})
-    total_enrollments = await db.enrollments.count_documents({})
-    total_revenue = await db.payment_transactions.aggregate([
-        {"$match": {"payment_status": "paid"}},
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ]).to_list(1)
+    stats = await stats_rollup.read()
+    revenue_usd = stats['revenue_usd']
+    revenue_inr = stats['revenue_inr']
+    
+    return json_response({
+        "total_courses": stats['total_courses'],
+        "total_users": stats['total_users'],
+        "total_enrollments": stats['total_enrollments'],
+        # Totals combine Stripe (USD) and Razorpay (INR) revenue at 1 USD = 83 INR
+        "total_revenue_usd": round(revenue_usd + revenue_inr / 83, 2),
+        "total_revenue_inr": round(revenue_inr + revenue_usd * 83, 2),
+        "revenue_usd_stripe": round(revenue_usd, 2),
+        "revenue_inr_razorpay": round(revenue_inr, 2)
+    })
+
+@api_router.get("/admin/analytics")
+async def get_admin_analytics(
+    granularity: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    course_id: Optional[str] = None,
+    category: Optional[str] = None,
+    group_by: Optional[str] = None,
+    authorization: Optional[str] = Header(None)
+):
+    """Enrollments, revenue, completions and certificates per day, week or month"""
+    verify_admin(authorization)
+    
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    if group_by not in (None, "course", "category"):
+        raise HTTPException(status_code=400, detail="group_by must be 'course' or 'category'")
     
-    revenue = total_revenue[0]['total'] if total_revenue else 0
+    # Default ranges: 30 days, 12 weeks or 12 months up to now
+    end = end or datetime.utcnow()
+    if not start:
+        start = end - {"day": timedelta(days=30), "week": timedelta(weeks=12), "month": timedelta(days=365)}[granularity]
     
-    return {
-        "total_courses": total_courses,
-        "total_users": total_users,
-        "total_enrollments": total_enrollments,
-        "total_revenue_usd": round(revenue, 2),
-        "total_revenue_inr": round(revenue * 83, 2)
-    }
+    series = await analytics.series(granularity, start, end, course_id=course_id, category=category, group_by=group_by)
+    
+    return json_response({
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "series": series
+    })
+
+@api_router.post("/admin/analytics/rebuild")
+async def rebuild_admin_analytics(authorization: Optional[str] = Header(None)):
+    """Recompute analytics buckets from raw enrollments, payments and certificates"""
+    verify_admin(authorization)
+    
+    await analytics.rebuild()
+    
+    return {"success": True, "message": "Analytics rebuilt"}
 
 # ============= Admin/Seed APIs =============
 
@@ -1040,7 +1578,12 @@ async def seed_data():
         }
     ]
     
+    for course in courses:
+        course.update(lesson_fields(course['lessons']))
+    
     await db.courses.insert_many(courses)
+    clear_catalog_cache()
+    await stats_rollup.increment(total_courses=len(courses))
     
     # Seed live classes
     live_classes = [
@@ -1050,7 +1593,7 @@ async def seed_data():
             "date_time": datetime.utcnow() + timedelta(days=3),
             "instructor": "Irfana Begum",
             "max_participants": 50,
-            "enrolled_users": [],
+            "seats_taken": 0,
             "thumbnail": "https://images.unsplash.com/photo-1487412947147-5cebf100ffc2?w=400",
             "duration": 120
         },
@@ -1060,7 +1603,7 @@ async def seed_data():
             "date_time": datetime.utcnow() + timedelta(days=5),
             "instructor": "Nausheen Khan",
             "max_participants": 30,
-            "enrolled_users": [],
+            "seats_taken": 0,
             "thumbnail": "https://images.unsplash.com/photo-1610992015732-2449b76344bc?w=400",
             "duration": 90
         },
@@ -1070,7 +1613,7 @@ async def seed_data():
             "date_time": datetime.utcnow() + timedelta(days=7),
             "instructor": "Irfana Begum",
             "max_participants": 40,
-            "enrolled_users": [],
+            "seats_taken": 0,
             "thumbnail": "https://images.unsplash.com/photo-1562322140-8baeececf3df?w=400",
             "duration": 100
         }
@@ -1090,6 +1633,15 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
+)
+
+# gzip/brotli for JSON and HTML. Cached catalog bodies are compressed again
+# on every request, so the hot course routes stay at the default level too
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.environ.get('COMPRESSION_MIN_SIZE', '1024')),
+    level=int(os.environ.get('COMPRESSION_LEVEL', '6'))
 )
 
 # Configure logging
@@ -1099,6 +1651,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    await migrate_enrollments(db)
+    # Workers migrate concurrently, so the unique booking index has to exist first
+    await ensure_indexes(db, [index for index in INDEXES if index[0] == "live_class_bookings"])
+    await migrate_live_class_bookings(db)
+    await ensure_indexes(db)
+
+@app.on_event("startup")
+async def start_pubsub():
+    await pubsub.start()
+    await seat_feed.start()
+
+@app.on_event("startup")
+async def start_stats_reconciliation():
+    stats_rollup.start(STATS_RECONCILE_SECONDS)
+
+@app.on_event("startup")
+async def backfill_lesson_index():
+    """(Re)compute lesson_index for courses written before it existed or by an older version"""
+    async for course in db.courses.find({"lesson_index.version": {"$ne": INDEX_VERSION}}, {"lessons": 1}):
+        await db.courses.update_one(
+            {"_id": course['_id']},
+            {"$set": lesson_fields(course.get('lessons', []))}
+        )
+    clear_catalog_cache()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await sms_dispatcher.close()
+    await seat_feed.stop()
+    await pubsub.stop()
+    await stats_rollup.stop()
+    payment_gateway.close()
     client.close()
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Set
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Stops calling a failing dependency until `reset_timeout` has passed.
+
+    After `failure_threshold` consecutive failures the breaker opens. Once the
+    timeout elapses a single trial call is let through; success closes the
+    breaker again, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        if self._opened_at is None:
+            return False
+        return self._trial_in_flight or time.monotonic() - self._opened_at < self.reset_timeout
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed, claiming the trial slot when half-open"""
+        if self._opened_at is None:
+            return True
+        if self.is_open:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+
+class SMSDispatcher:
+    """Delivers SMS in the background on a bounded thread pool.
+
+    `send` is the blocking provider call, e.g. a wrapper around
+    `twilio_client.messages.create`. Callers get an answer immediately from
+    `dispatch`; delivery happens off the event loop with a timeout, and a
+    circuit breaker sheds messages while the provider is failing.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, str], Any],
+        max_workers: int = 4,
+        max_pending: int = 200,
+        timeout: float = 10,
+        breaker: CircuitBreaker = None
+    ):
+        self._send = send
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sms")
+        self._max_pending = max_pending
+        self._timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def dispatch(self, to: str, body: str) -> bool:
+        """Queue a message; returns False if it was shed instead"""
+        if self.breaker.is_open:
+            logger.warning(f"SMS circuit open, not sending to {to}")
+            return False
+        if len(self._tasks) >= self._max_pending:
+            logger.warning(f"SMS queue full ({self._max_pending}), not sending to {to}")
+            return False
+
+        task = asyncio.ensure_future(self._deliver(to, body))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _deliver(self, to: str, body: str):
+        if not self.breaker.allow():
+            logger.warning(f"SMS circuit open, dropped message to {to}")
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await asyncio.wait_for(
+                loop.run_in_executor(self._executor, self._send, to, body),
+                timeout=self._timeout
+            )
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.error(f"Failed to send SMS to {to}: {e!r}")
+            return
+
+        self.breaker.record_success()
+        logger.info(f"SMS sent to {to}. Message SID: {getattr(result, 'sid', None)}")
+
+    async def close(self):
+        """Wait for queued messages, then release the worker threads"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,84 @@
+import gzip
+import textwrap
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from http_cache import make_etag, not_modified
+
+try:
+    import brotli
+except ImportError:  # brotli variants are skipped without the package
+    brotli = None
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """Content codings from an Accept-Encoding header mapped to their q-values"""
+    encodings = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                q = float(value)
+            except ValueError:
+                q = 0.0
+        encodings[coding.strip().lower()] = q
+    return encodings
+
+
+def preferred_encoding(accept_encoding: Optional[str], codings: Iterable[str]) -> Optional[str]:
+    """The coding from `codings` with the highest q-value, earlier ones winning ties.
+
+    None if the client accepts none of them, or explicitly rates identity higher.
+    """
+    accepted = accepted_encodings(accept_encoding)
+    best, best_q = None, 0.0
+    for coding in codings:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    if accepted.get("identity", 0.0) > best_q:
+        return None
+    return best
+
+
+@dataclass(frozen=True)
+class StaticPage:
+    """A page rendered once into bytes, with its precompressed variants"""
+    media_type: str
+    variants: Dict[str, bytes]  # content coding ("identity", "gzip", "br") -> body
+    etags: Dict[str, str]
+
+    @classmethod
+    def render(cls, content: str, media_type: str = "text/html; charset=utf-8") -> "StaticPage":
+        body = textwrap.dedent(content).strip().encode()
+        # mtime=0 keeps the gzip bytes, and so the ETag, identical on every worker
+        variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants["br"] = brotli.compress(body, quality=11)
+        # Each coding is a different representation, so each gets its own strong ETag
+        etag = make_etag(body).strip('"')
+        etags = {
+            coding: f'"{etag}"' if coding == "identity" else f'"{etag}-{coding}"'
+            for coding in variants
+        }
+        return cls(media_type, variants, etags)
+
+    def choose_encoding(self, accept_encoding: Optional[str]) -> str:
+        codings = [coding for coding in ("br", "gzip") if coding in self.variants]
+        return preferred_encoding(accept_encoding, codings) or "identity"
+
+    def response(self, request: Request, cache_control: str) -> Response:
+        coding = self.choose_encoding(request.headers.get("accept-encoding"))
+        headers = {"ETag": self.etags[coding], "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if not_modified(request, self.etags[coding]):
+            return Response(status_code=304, headers=headers)
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        return Response(self.variants[coding], media_type=self.media_type, headers=headers)
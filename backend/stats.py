@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+STATS_ID = "global"
+COUNTERS = ("total_courses", "total_users", "total_enrollments", "revenue_usd", "revenue_inr")
+
+
+class StatsRollup:
+    """Admin dashboard totals kept in a single `stats` document.
+
+    Write paths call `increment` as they go; `reconcile` recomputes every
+    counter from the source collections and runs periodically to repair any
+    drift (e.g. increments lost to a crash between two writes).
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self._task = None
+
+    async def increment(self, session=None, **deltas: float):
+        await self._db.stats.update_one(
+            {"_id": STATS_ID},
+            {"$inc": deltas, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True,
+            session=session
+        )
+
+    async def read(self) -> Dict[str, Any]:
+        doc = await self._db.stats.find_one({"_id": STATS_ID})
+        if doc is None:
+            doc = await self.reconcile()
+        return {counter: doc.get(counter, 0) for counter in COUNTERS}
+
+    async def _paid_total(self, collection: str, match: Dict[str, Any]) -> float:
+        result = await self._db[collection].aggregate([
+            {"$match": match},
+            {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
+        ]).to_list(1)
+        return result[0]['total'] if result else 0
+
+    async def reconcile(self) -> Dict[str, Any]:
+        """Recompute every counter from the source collections"""
+        totals = {
+            "total_courses": await self._db.courses.count_documents({}),
+            "total_users": await self._db.users.count_documents({}),
+            "total_enrollments": await self._db.enrollments.count_documents({}),
+            # Stripe checkouts are charged in USD, Razorpay orders in INR
+            "revenue_usd": await self._paid_total("payment_transactions", {"payment_status": "paid"}),
+            "revenue_inr": await self._paid_total("payment_orders", {"status": "paid"}),
+            "reconciled_at": datetime.utcnow()
+        }
+        await self._db.stats.update_one({"_id": STATS_ID}, {"$set": totals}, upsert=True)
+        return totals
+
+    def start(self, interval: float):
+        """Reconcile now and then every `interval` seconds in the background"""
+        self._task = asyncio.create_task(self._reconcile_forever(interval))
+
+    async def _reconcile_forever(self, interval: float):
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"Stats reconciliation failed: {e!r}")
+            await asyncio.sleep(interval)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
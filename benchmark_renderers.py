@@ -0,0 +1,49 @@
+"""Compare JSON and MessagePack payload size and encode time for the mobile read endpoints.
+
+Fetches live payloads from a running backend, then re-encodes them locally
+with each renderer:
+
+    python benchmark_renderers.py [BASE_URL]
+"""
+import gzip
+import json
+import sys
+import timeit
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from renderers import RENDERERS  # noqa: E402
+
+BASE_URL = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8001/api"
+ROUNDS = 200
+
+
+def fetch(path):
+    response = requests.get(f"{BASE_URL}{path}", timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+courses = fetch("/courses")
+payloads = {
+    "/courses": courses,
+    "/live-classes": fetch("/live-classes"),
+}
+if courses:
+    # The largest syllabus is the worst case for the detail screen
+    details = [fetch(f"/courses/{course['id']}") for course in courses]
+    payloads["/courses/{id} (largest)"] = max(details, key=lambda c: len(json.dumps(c)))
+
+encoders = {"json (stdlib)": lambda content: json.dumps(content).encode()}
+for media_type, renderer in RENDERERS.items():
+    if media_type != "application/x-msgpack":
+        encoders[media_type] = renderer.render
+
+print(f"{'endpoint':<26} {'encoding':<22} {'bytes':>9} {'gzip':>8} {'encode us':>10}")
+for path, content in payloads.items():
+    for name, encode in encoders.items():
+        body = encode(content)
+        seconds = timeit.timeit(lambda: encode(content), number=ROUNDS) / ROUNDS
+        print(f"{path:<26} {name:<22} {len(body):>9} {len(gzip.compress(body)):>8} {seconds * 1e6:>10.1f}")
@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { View, Text, ScrollView, StyleSheet, TouchableOpacity, Image, ActivityIndicator, RefreshControl, Alert } from 'react-native';
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { Ionicons } from '@expo/vector-icons';
-import api from '../../utils/api';
+import api, { BACKEND_URL } from '../../utils/api';
 
 interface LiveClass {
   id: string;
@@ -11,7 +11,10 @@ interface LiveClass {
   date_time: string;
   instructor: string;
   max_participants: number;
-  enrolled_users: string[];
+  seats_taken: number;
+  waitlist_count: number;
+  booked: boolean;
+  waitlisted: boolean;
   thumbnail: string;
   duration: number;
 }
@@ -27,6 +30,21 @@ export default function LiveClassesScreen() {
     fetchLiveClasses();
   }, []);
 
+  // Live seat counts where EventSource exists (web); native relies on pull-to-refresh
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') return;
+    const source = new EventSource(`${BACKEND_URL}/api/live-classes/seats/stream`);
+    source.addEventListener('seats', (event: MessageEvent) => {
+      const seats: { id: string; seats_taken: number }[] = JSON.parse(event.data);
+      const taken = new Map(seats.map(s => [s.id, s.seats_taken]));
+      const apply = (list: LiveClass[]) =>
+        list.map(c => (taken.has(c.id) ? { ...c, seats_taken: taken.get(c.id)! } : c));
+      setClasses(apply);
+      setMyClasses(apply);
+    });
+    return () => source.close();
+  }, []);
+
   const fetchLiveClasses = async () => {
     try {
       const [upcomingResponse, myResponse] = await Promise.all([
@@ -151,12 +169,12 @@ export default function LiveClassesScreen() {
                     <View style={styles.classDetail}>
                       <Ionicons name="people-outline" size={16} color="#666" />
                       <Text style={styles.classDetailText}>
-                        {liveClass.enrolled_users.length}/{liveClass.max_participants}
+                        {liveClass.seats_taken}/{liveClass.max_participants}
                       </Text>
                     </View>
                   </View>
 
-                  {selectedTab === 'upcoming' && (
+                  {selectedTab === 'upcoming' && !liveClass.booked && (
                     <TouchableOpacity 
                       style={styles.bookButton}
                       onPress={() => handleBookClass(liveClass.id)}
@@ -166,7 +184,7 @@ export default function LiveClassesScreen() {
                     </TouchableOpacity>
                   )}
 
-                  {selectedTab === 'my' && (
+                  {(selectedTab === 'my' || liveClass.booked) && (
                     <View style={styles.bookedBadge}>
                       <Ionicons name="checkmark-circle" size={18} color="#4CAF50" />
                       <Text style={styles.bookedText}>Booked</Text>
@@ -3,7 +3,8 @@ import { View, Text, StyleSheet, TouchableOpacity, ActivityIndicator, Alert } fr
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { useRouter, useLocalSearchParams } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
-import api from '../utils/api';
+import AsyncStorage from '@react-native-async-storage/async-storage';
+import api, { BACKEND_URL } from '../utils/api';
 
 export default function PaymentSuccessScreen() {
   const [verifying, setVerifying] = useState(true);
@@ -12,9 +13,45 @@ export default function PaymentSuccessScreen() {
   const { session_id } = useLocalSearchParams<{ session_id: string }>();
 
   useEffect(() => {
-    if (session_id) {
-      verifyPayment();
+    if (!session_id) {
+      return;
     }
+
+    // Wait for the server to push the outcome; fall back to polling if the socket fails
+    let socket: WebSocket | null = null;
+    let settled = false;
+
+    const listen = async () => {
+      const token = await AsyncStorage.getItem('auth_token');
+      const wsUrl = BACKEND_URL.replace(/^http/, 'ws');
+      socket = new WebSocket(`${wsUrl}/api/ws/payments/${session_id}?token=${token}`);
+
+      socket.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        if (data.status === 'paid') {
+          settled = true;
+          setSuccess(true);
+          setVerifying(false);
+        } else if (data.status === 'failed') {
+          settled = true;
+          setVerifying(false);
+        }
+      };
+
+      socket.onclose = () => {
+        if (!settled) {
+          settled = true;
+          verifyPayment();
+        }
+      };
+    };
+
+    listen();
+
+    return () => {
+      settled = true;
+      socket?.close();
+    };
   }, [session_id]);
 
   const verifyPayment = async () => {
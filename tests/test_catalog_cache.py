@@ -0,0 +1,101 @@
+import asyncio
+
+from catalog_cache import CatalogCache
+
+
+def test_concurrent_misses_share_one_load():
+    async def scenario():
+        cache = CatalogCache()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        results = await asyncio.gather(*(cache.get_or_load("key", loader) for _ in range(5)))
+        assert results == ["value"] * 5
+        assert len(calls) == 1
+        # Served from the cache afterwards
+        assert await cache.get_or_load("key", loader) == "value"
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_failed_load_is_not_cached():
+    async def scenario():
+        cache = CatalogCache()
+
+        async def failing():
+            raise RuntimeError("down")
+
+        async def loader():
+            return "value"
+
+        try:
+            await cache.get_or_load("key", failing)
+        except RuntimeError:
+            pass
+        assert await cache.get_or_load("key", loader) == "value"
+
+    asyncio.run(scenario())
+
+
+def test_invalidate_forces_a_reload():
+    async def scenario():
+        cache = CatalogCache()
+        values = iter(["old", "new"])
+
+        async def loader():
+            return next(values)
+
+        assert await cache.get_or_load("key", loader) == "old"
+        cache.invalidate("key")
+        assert await cache.get_or_load("key", loader) == "new"
+
+    asyncio.run(scenario())
+
+
+def test_load_racing_an_invalidation_is_not_cached():
+    async def scenario():
+        cache = CatalogCache()
+        started, release = asyncio.Event(), asyncio.Event()
+        values = iter(["stale", "fresh"])
+
+        async def loader():
+            value = next(values)
+            if value == "stale":
+                started.set()
+                await release.wait()
+            return value
+
+        pending = asyncio.ensure_future(cache.get_or_load("key", loader))
+        await started.wait()
+        cache.clear()
+        release.set()
+        # The caller that started the load still gets its result...
+        assert await pending == "stale"
+        # ...but the next read loads again
+        assert await cache.get_or_load("key", loader) == "fresh"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_shared_load():
+    async def scenario():
+        cache = CatalogCache()
+        release = asyncio.Event()
+
+        async def loader():
+            await release.wait()
+            return "value"
+
+        first = asyncio.ensure_future(cache.get_or_load("key", loader))
+        second = asyncio.ensure_future(cache.get_or_load("key", loader))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        assert await second == "value"
+
+    asyncio.run(scenario())
@@ -0,0 +1,106 @@
+import gzip
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from compression import CompressionMiddleware
+
+BIG = "x" * 4096
+
+
+async def big(request):
+    return PlainTextResponse(BIG, headers={"ETag": '"abc"'})
+
+
+async def small(request):
+    return PlainTextResponse("tiny")
+
+
+async def image(request):
+    return Response(BIG.encode(), media_type="image/png")
+
+
+async def encoded(request):
+    return Response(gzip.compress(BIG.encode()), media_type="text/plain", headers={"Content-Encoding": "gzip"})
+
+
+async def stream(request):
+    async def chunks():
+        for _ in range(3):
+            yield "chunk "
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+def client(**options):
+    app = Starlette(routes=[
+        Route("/big", big), Route("/small", small), Route("/image", image),
+        Route("/encoded", encoded), Route("/stream", stream), Route("/raw/big", big),
+    ])
+    app.add_middleware(CompressionMiddleware, **options)
+    return TestClient(app)
+
+
+def get(test_client, path, accept_encoding="gzip"):
+    return test_client.get(path, headers={"Accept-Encoding": accept_encoding})
+
+
+def test_compresses_large_responses():
+    response = get(client(), "/big")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == BIG
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.headers["etag"] == 'W/"abc"'
+
+
+def test_small_responses_pass_through():
+    response = get(client(), "/small")
+    assert "content-encoding" not in response.headers
+    assert response.text == "tiny"
+
+
+def test_coding_follows_q_values(monkeypatch):
+    monkeypatch.setattr("compression.brotli", None)
+    test_client = client()
+    assert get(test_client, "/big", accept_encoding="br;q=1, gzip;q=0.1").headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in get(test_client, "/big", accept_encoding="gzip;q=0.5, identity").headers
+
+
+def test_brotli_only_when_preferred(monkeypatch):
+    # Only the choice is checked, so any stand-in for the module will do
+    monkeypatch.setattr("compression.brotli", object())
+    middleware = CompressionMiddleware(None)
+
+    def coding(accept_encoding):
+        return middleware._coding({"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]})
+
+    assert coding("br;q=0.1, gzip;q=1") == "gzip"
+    assert coding("gzip, br") == "br"
+
+
+def test_needs_accepted_encoding():
+    response = get(client(), "/big", accept_encoding="identity")
+    assert "content-encoding" not in response.headers
+    response = get(client(), "/big", accept_encoding="gzip;q=0")
+    assert "content-encoding" not in response.headers
+
+
+def test_skips_other_content_types_and_encoded_bodies():
+    assert "content-encoding" not in get(client(), "/image").headers
+    response = get(client(), "/encoded")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == BIG
+
+
+def test_streams_are_compressed_chunk_by_chunk():
+    response = get(client(), "/stream")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == "chunk " * 3
+
+
+def test_route_level_zero_disables_compression():
+    test_client = client(route_levels={"/raw": 0})
+    assert "content-encoding" not in get(test_client, "/raw/big").headers
+    assert get(test_client, "/big").headers["content-encoding"] == "gzip"
@@ -0,0 +1,34 @@
+from starlette.requests import Request
+
+from http_cache import make_etag, not_modified
+
+
+def request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_make_etag_is_canonical_for_data():
+    assert make_etag({"a": 1, "b": 2}) == make_etag({"b": 2, "a": 1})
+    assert make_etag(b"body") == make_etag("body")
+    assert make_etag(b"body") != make_etag(b"other")
+
+
+def test_no_header_is_modified():
+    assert not not_modified(request(), '"abc"')
+    assert not not_modified(request(""), '"abc"')
+
+
+def test_matching_tag():
+    assert not_modified(request('"abc"'), '"abc"')
+    assert not not_modified(request('"abd"'), '"abc"')
+
+
+def test_tag_list_and_wildcard():
+    assert not_modified(request('"x", "abc" , "y"'), '"abc"')
+    assert not_modified(request(" * "), '"abc"')
+
+
+def test_weak_comparison_ignores_w_prefix():
+    # The compression middleware weakens tags, so clients echo W/"..."
+    assert not_modified(request('W/"abc"'), '"abc"')
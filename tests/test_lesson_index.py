@@ -0,0 +1,50 @@
+from lesson_index import INDEX_VERSION, build_lesson_index
+
+
+def test_flat_lessons_get_positional_ids():
+    lessons, index = build_lesson_index([{"title": "a", "duration": "15 mins"}, {"title": "b", "duration": 30}])
+    assert [lesson["id"] for lesson in lessons] == ["lesson1", "lesson2"]
+    assert index["lesson_ids"] == ["lesson1", "lesson2"]
+    assert index["durations"] == [15, 30]
+    assert index["count"] == 2
+    assert index["total_duration"] == 45
+    assert index["version"] == INDEX_VERSION
+
+
+def test_wrapper_children_are_the_lessons():
+    lessons, index = build_lesson_index([
+        {"type": "theory", "modules": [{"title": "m1"}, {"title": "m2"}]},
+        {"type": "practical", "videos": [{"title": "v1", "duration": "10 min"}]},
+    ])
+    assert index["lesson_ids"] == ["theory-1", "theory-2", "practical-1"]
+    assert index["durations"] == [0, 0, 10]
+    assert lessons[1]["videos"][0]["id"] == "practical-1"
+
+
+def test_empty_wrapper_is_not_a_lesson():
+    _, index = build_lesson_index([
+        {"type": "theory", "modules": []},
+        {"type": "practical", "videos": [{"title": "v1"}]},
+        {"title": "x"},
+    ])
+    assert index["lesson_ids"] == ["practical-1", "lesson3"]
+    assert index["count"] == 2
+
+
+def test_existing_ids_are_kept_and_duplicates_counted_once():
+    _, index = build_lesson_index([{"id": 7, "title": "a"}, {"id": "7", "title": "again"}, {"title": "b"}])
+    assert index["lesson_ids"] == ["7", "lesson3"]
+
+
+def test_input_is_not_modified():
+    original = [{"title": "a"}]
+    build_lesson_index(original)
+    assert original == [{"title": "a"}]
+
+
+def test_content_hash_follows_content():
+    _, first = build_lesson_index([{"title": "a"}])
+    _, same = build_lesson_index([{"title": "a"}])
+    _, changed = build_lesson_index([{"title": "b"}])
+    assert first["content_hash"] == same["content_hash"]
+    assert first["content_hash"] != changed["content_hash"]
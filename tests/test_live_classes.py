@@ -0,0 +1,229 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from live_classes import BOOKED, WAITLISTED, BookingError, LiveClassBookings
+
+
+def _value(doc, expression):
+    """Evaluate the aggregation expressions used in `$expr` filters"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return doc.get(expression[1:])
+    if isinstance(expression, dict):
+        (operator, args), = expression.items()
+        if operator == "$ifNull":
+            value = _value(doc, args[0])
+            return _value(doc, args[1]) if value is None else value
+        if operator == "$lt":
+            return _value(doc, args[0]) < _value(doc, args[1])
+        raise NotImplementedError(operator)
+    return expression
+
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        if field == "$expr":
+            if not _value(doc, condition):
+                return False
+        elif isinstance(condition, dict):
+            for operator, operand in condition.items():
+                value = doc.get(field)
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$gt" and not (value is not None and value > operand):
+                    return False
+                if operator == "$lt" and not (value is not None and value < operand):
+                    return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+class FakeCollection:
+    """In-memory collection with atomic single-document writes.
+
+    Every operation first yields to the event loop a random number of times,
+    so concurrent callers interleave between operations the way they do
+    against a real server.
+    """
+
+    def __init__(self, rng, unique=None):
+        self.docs = []
+        self._rng = rng
+        self._unique = unique
+
+    async def _yield(self):
+        for _ in range(self._rng.randint(0, 3)):
+            await asyncio.sleep(0)
+
+    def _find(self, query, sort=None):
+        docs = [doc for doc in self.docs if _matches(doc, query)]
+        for field, direction in reversed(sort or []):
+            docs.sort(key=lambda doc: doc[field], reverse=direction < 0)
+        return docs[0] if docs else None
+
+    def _check_unique(self, doc):
+        if self._unique and any(
+            other is not doc and all(other.get(f) == doc.get(f) for f in self._unique) for other in self.docs
+        ):
+            raise DuplicateKeyError("E11000 duplicate key error")
+
+    def _apply(self, doc, update):
+        for field, value in update.get("$set", {}).items():
+            doc[field] = value
+        for field, amount in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + amount
+
+    async def find_one(self, query, projection=None):
+        await self._yield()
+        doc = self._find(query)
+        return dict(doc) if doc else None
+
+    async def insert_one(self, doc):
+        await self._yield()
+        doc = {"_id": ObjectId(), **doc}
+        self._check_unique(doc)
+        self.docs.append(doc)
+
+    async def update_one(self, query, update, upsert=False):
+        await self._yield()
+        doc = self._find(query)
+        if doc is None:
+            if upsert:
+                doc = {"_id": ObjectId(), **{k: v for k, v in query.items() if not isinstance(v, dict)}}
+                self._apply(doc, update)
+                doc.update(update.get("$setOnInsert", {}))
+                self._check_unique(doc)
+                self.docs.append(doc)
+            return SimpleNamespace(modified_count=0)
+        updated = dict(doc)
+        self._apply(updated, update)
+        self._check_unique(updated)
+        doc.update(updated)
+        return SimpleNamespace(modified_count=1)
+
+    async def find_one_and_update(self, query, update, sort=None):
+        await self._yield()
+        doc = self._find(query, sort)
+        if doc is None:
+            return None
+        before = dict(doc)
+        self._apply(doc, update)
+        return before
+
+    async def find_one_and_delete(self, query):
+        await self._yield()
+        doc = self._find(query)
+        if doc is not None:
+            self.docs.remove(doc)
+        return doc
+
+    async def count_documents(self, query):
+        await self._yield()
+        return sum(1 for doc in self.docs if _matches(doc, query))
+
+
+def setup(seed, max_participants):
+    rng = random.Random(seed)
+    db = SimpleNamespace(
+        live_classes=FakeCollection(rng),
+        live_class_bookings=FakeCollection(rng, unique=("class_id", "user_id"))
+    )
+    class_id = ObjectId()
+    db.live_classes.docs.append({"_id": class_id, "max_participants": max_participants, "seats_taken": 0})
+    return db, class_id, LiveClassBookings(db)
+
+
+def check_invariants(db, class_id):
+    live_class = db.live_classes.docs[0]
+    statuses = [b["status"] for b in db.live_class_bookings.docs if b["class_id"] == class_id]
+    assert live_class["seats_taken"] <= live_class["max_participants"]
+    assert live_class["seats_taken"] == statuses.count(BOOKED)
+    # Nobody waits while a seat is free
+    if WAITLISTED in statuses:
+        assert live_class["seats_taken"] == live_class["max_participants"]
+
+
+SEEDS = range(25)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_concurrent_bookings_never_exceed_capacity(seed):
+    db, class_id, bookings = setup(seed, max_participants=3)
+
+    async def scenario():
+        return await asyncio.gather(*(bookings.book(class_id, f"user{i}", join_waitlist=True) for i in range(12)))
+
+    outcomes = asyncio.run(scenario())
+    assert [o["status"] for o in outcomes].count(BOOKED) == 3
+    # Positions are snapshots taken while others are still joining
+    positions = [o["position"] for o in outcomes if o["status"] == WAITLISTED]
+    assert len(positions) == 9 and all(1 <= p <= 9 for p in positions)
+    check_invariants(db, class_id)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_full_class_without_waitlist_is_refused(seed):
+    db, class_id, bookings = setup(seed, max_participants=1)
+
+    async def scenario():
+        return await asyncio.gather(
+            *(bookings.book(class_id, f"user{i}") for i in range(4)), return_exceptions=True
+        )
+
+    outcomes = asyncio.run(scenario())
+    assert [o for o in outcomes if not isinstance(o, Exception)] == [{"status": BOOKED}]
+    assert all(str(o) == "Class is full" for o in outcomes if isinstance(o, BookingError))
+    assert len(db.live_class_bookings.docs) == 1
+    check_invariants(db, class_id)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_duplicate_booking_releases_its_seat(seed):
+    db, class_id, bookings = setup(seed, max_participants=2)
+
+    async def scenario():
+        await bookings.book(class_id, "alice")
+        # Alice's repeat holds the last seat for a moment while Bob asks for it
+        return await asyncio.gather(
+            bookings.book(class_id, "alice", join_waitlist=True),
+            bookings.book(class_id, "bob", join_waitlist=True),
+            return_exceptions=True
+        )
+
+    repeat, bob = asyncio.run(scenario())
+    assert isinstance(repeat, BookingError)
+    # Bob may have been waitlisted in the window, but must end up with the freed seat
+    statuses = {b["user_id"]: b["status"] for b in db.live_class_bookings.docs}
+    assert statuses == {"alice": BOOKED, "bob": BOOKED}
+    check_invariants(db, class_id)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_cancellations_promote_the_waitlist_in_order(seed):
+    db, class_id, bookings = setup(seed, max_participants=2)
+    waitlist = [f"waiting{i}" for i in range(4)]
+
+    async def scenario():
+        for user_id in ["booked0", "booked1"] + waitlist:
+            await bookings.book(class_id, user_id, join_waitlist=True)
+        assert [await bookings.waitlist_position(class_id, u) for u in waitlist] == [1, 2, 3, 4]
+        await asyncio.gather(bookings.cancel(class_id, "booked0"), bookings.cancel(class_id, "booked1"))
+        check_invariants(db, class_id)
+        await bookings.cancel(class_id, waitlist[0])
+
+    asyncio.run(scenario())
+    statuses = {b["user_id"]: b["status"] for b in db.live_class_bookings.docs}
+    assert statuses == {waitlist[1]: BOOKED, waitlist[2]: BOOKED, waitlist[3]: WAITLISTED}
+    check_invariants(db, class_id)
+
+
+def test_cancel_without_booking():
+    _, class_id, bookings = setup(0, max_participants=1)
+    with pytest.raises(BookingError) as error:
+        asyncio.run(bookings.cancel(class_id, "nobody"))
+    assert error.value.status_code == 404
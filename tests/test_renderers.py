@@ -0,0 +1,46 @@
+import pytest
+from starlette.requests import Request
+
+from renderers import JSON, RENDERERS, negotiate
+
+
+def request(accept=None):
+    headers = [(b"accept", accept.encode())] if accept is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_defaults_to_json():
+    assert negotiate(request()) is JSON
+    assert negotiate(request("*/*")) is JSON
+    assert negotiate(request("text/html")) is JSON
+
+
+def test_unparseable_q_is_ignored():
+    assert negotiate(request("application/msgpack;q=abc")) is JSON
+
+
+msgpack_only = pytest.mark.skipif("application/msgpack" not in RENDERERS, reason="msgpack not installed")
+
+
+@msgpack_only
+def test_msgpack_when_preferred():
+    assert negotiate(request("application/msgpack")).media_type == "application/msgpack"
+    assert negotiate(request("application/x-msgpack")).media_type == "application/msgpack"
+
+
+@msgpack_only
+def test_q_values_order_preferences():
+    assert negotiate(request("application/msgpack;q=0.5, application/json")) is JSON
+    assert negotiate(request("application/json;q=0.5, application/msgpack")).media_type == "application/msgpack"
+    assert negotiate(request("application/msgpack;q=0, application/json;q=0.1")) is JSON
+
+
+@msgpack_only
+def test_msgpack_matches_json_values():
+    import msgpack
+    from datetime import datetime
+    from bson import ObjectId
+
+    content = {"id": ObjectId("0123456789abcdef01234567"), "at": datetime(2024, 1, 2, 3, 4, 5)}
+    decoded = msgpack.unpackb(RENDERERS["application/msgpack"].render(content))
+    assert decoded == {"id": "0123456789abcdef01234567", "at": "2024-01-02T03:04:05"}
@@ -0,0 +1,27 @@
+import gzip
+
+from static_pages import StaticPage, preferred_encoding
+
+
+def test_highest_q_wins():
+    assert preferred_encoding("br;q=0.1, gzip;q=1", ["br", "gzip"]) == "gzip"
+    assert preferred_encoding("gzip;q=0.5, *;q=0.8", ["br", "gzip"]) == "br"
+
+
+def test_order_breaks_ties():
+    assert preferred_encoding("gzip, br", ["br", "gzip"]) == "br"
+    assert preferred_encoding("*", ["br", "gzip"]) == "br"
+
+
+def test_nothing_acceptable():
+    assert preferred_encoding(None, ["br", "gzip"]) is None
+    assert preferred_encoding("br;q=0, gzip;q=0", ["br", "gzip"]) is None
+    assert preferred_encoding("gzip;q=0.5, identity", ["br", "gzip"]) is None
+
+
+def test_page_serves_a_variant_it_has():
+    page = StaticPage.render("<p>policy</p>")
+    page.variants.pop("br", None)
+    assert page.choose_encoding("br") == "identity"
+    assert page.choose_encoding("br, gzip;q=0.5") == "gzip"
+    assert gzip.decompress(page.variants["gzip"]) == page.variants["identity"]